@@ -8,12 +8,23 @@ Almacenamiento robusto y escalable en la nube
 """
 
 import os
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+import orjson
 import pandas as pd
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extensions import connection as PGConnection, ISOLATION_LEVEL_AUTOCOMMIT
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from contextlib import contextmanager
+from functools import wraps
+from hmac import compare_digest
+import csv
+import io
 import json
+import select
+import threading
 from datetime import datetime
 import logging
 import time
@@ -25,7 +36,17 @@ logging.basicConfig(
     handlers=[logging.StreamHandler()]
 )
 
+class ORJSONProvider(DefaultJSONProvider):
+    """Serialización JSON con orjson (datetime nativo, mucho más rápido)"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 
 # Configuración CORS para dominio personalizado
 CORS(app, origins=[
@@ -38,6 +59,69 @@ CORS(app, origins=[
 # Configuración desde variables de entorno
 ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '2205')
 DATABASE_URL = os.environ.get('DATABASE_URL')
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', 2))
+# Presupuesto de conexiones por worker: una por hilo en el pool (WEB_THREADS,
+# igual que --threads) + una dedicada por suscriptor SSE, fuera del pool.
+# Total ≈ WEB_CONCURRENCY * (WEB_THREADS + SSE_MAX_SUBSCRIBERS).
+WEB_THREADS = int(os.environ.get('WEB_THREADS', 8))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', WEB_THREADS))
+BULK_BATCH_SIZE = 50
+CACHE_TTL = int(os.environ.get('CACHE_TTL', 10))  # segundos
+CACHE_MAX_ENTRIES = 32
+CANAL_CAMBIOS = 'contactos_changed'  # LISTEN/NOTIFY
+SSE_KEEPALIVE = 15  # segundos
+SSE_MAX_SUBSCRIBERS = int(os.environ.get('SSE_MAX_SUBSCRIBERS', 4))  # por proceso
+STREAM_ITERSIZE = 500  # filas por viaje del cursor server-side
+
+# Sentencias frecuentes: se preparan una vez por conexión del pool
+SENTENCIAS_PREPARADAS = {
+    'ins_contacto': """
+        INSERT INTO contactos (
+            timestamp, nombre, email, telefono, estado, notas, 
+            ip_address, user_agent
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+        ON CONFLICT (timestamp) DO UPDATE SET
+            nombre = EXCLUDED.nombre,
+            email = EXCLUDED.email,
+            telefono = EXCLUDED.telefono,
+            estado = EXCLUDED.estado,
+            notas = EXCLUDED.notas,
+            fecha_actualizacion = CURRENT_TIMESTAMP
+        RETURNING id, timestamp
+    """,
+    'ins_contacto_auto': """
+        INSERT INTO contactos (
+            nombre, email, telefono, estado, notas, 
+            ip_address, user_agent
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7)
+        RETURNING id, timestamp
+    """,
+    'sel_contactos': """
+        SELECT id, timestamp, nombre, email, telefono, estado, notas,
+               ip_address, user_agent, fecha_creacion, fecha_actualizacion
+        FROM contactos 
+        WHERE ($1::timestamp IS NULL OR (fecha_creacion, id) < ($1::timestamp, $2::integer))
+        ORDER BY fecha_creacion DESC, id DESC
+        LIMIT $3
+    """,
+    'sel_contacto': "SELECT * FROM contactos WHERE timestamp = $1",
+    'del_contacto': "DELETE FROM contactos WHERE timestamp = $1",
+    # Texto fijo: los campos sin cambios llegan como NULL
+    'upd_contacto': """
+        UPDATE contactos SET
+            nombre = COALESCE($1, nombre),
+            email = COALESCE($2, email),
+            telefono = COALESCE($3, telefono),
+            estado = COALESCE($4, estado),
+            notas = COALESCE($5, notas),
+            fecha_actualizacion = CURRENT_TIMESTAMP
+        WHERE timestamp = $6
+    """,
+}
+
+class PreparedConnection(PGConnection):
+    """Conexión que recuerda si ya preparó SENTENCIAS_PREPARADAS"""
+    prepared = False
 
 class PostgreSQLStorageManager:
     """
@@ -45,55 +129,153 @@ class PostgreSQLStorageManager:
     Compatible con Render.com y bases de datos en la nube
     """
     
-    def __init__(self):
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self._pool_lock = threading.Lock()
+        self._crear_pool()
+        self._cache = {}
+        self._cache_ts = {}
+        self._cache_lock = threading.Lock()
         self.init_database()
     
-    def get_connection(self):
-        """Obtener conexión a PostgreSQL"""
+    def _crear_pool(self):
+        """Crear el pool de conexiones para el proceso actual"""
         try:
-            conn = psycopg2.connect(DATABASE_URL)
-            return conn
+            self.pool = ThreadedConnectionPool(
+                self.minconn, self.maxconn, DATABASE_URL,
+                connection_factory=PreparedConnection
+            )
+            self._pool_pid = os.getpid()
         except Exception as e:
             logging.error(f"Error conectando a PostgreSQL: {e}")
             raise
     
+    @contextmanager
+    def _conn(self, preparar=True):
+        """Tomar una conexión del pool y devolverla al terminar"""
+        if self._pool_pid != os.getpid():
+            # Worker forkeado con --preload: no compartir sockets con el master.
+            # Con varios hilos, solo el primero recrea el pool (doble chequeo)
+            with self._pool_lock:
+                if self._pool_pid != os.getpid():
+                    self._crear_pool()
+        # Referencia local: la conexión vuelve al mismo pool que la prestó
+        pool = self.pool
+        conn = pool.getconn()
+        try:
+            if preparar and not conn.prepared:
+                self._preparar(conn)
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn)
+    
+    def _preparar(self, conn):
+        """PREPARE de las sentencias frecuentes en esta sesión"""
+        cursor = conn.cursor()
+        for nombre, sql in SENTENCIAS_PREPARADAS.items():
+            cursor.execute(f"PREPARE {nombre} AS {sql}")
+        conn.commit()
+        cursor.close()
+        conn.prepared = True
+    
+    def _notificar(self, cursor, payload):
+        """NOTIFY a los suscriptores de /admin/stream (se envía al hacer commit)"""
+        cursor.execute("SELECT pg_notify(%s, %s)", (CANAL_CAMBIOS, str(payload)))
+    
+    def _cache_get(self, key):
+        """Devolver valor cacheado si no venció el TTL"""
+        if time.time() - self._cache_ts.get(key, 0) < CACHE_TTL:
+            return self._cache.get(key)
+        return None
+    
+    def _cache_set(self, key, valor):
+        """Guardar valor en cache con la hora actual (como mucho CACHE_MAX_ENTRIES)"""
+        with self._cache_lock:
+            if key not in self._cache and len(self._cache) >= CACHE_MAX_ENTRIES:
+                # Lleno: sale la entrada más vieja
+                viejo = min(self._cache_ts, key=self._cache_ts.get)
+                self._cache.pop(viejo, None)
+                self._cache_ts.pop(viejo, None)
+            self._cache[key] = valor
+            self._cache_ts[key] = time.time()
+    
+    def _cache_clear(self):
+        """Invalidar cache tras cualquier escritura"""
+        with self._cache_lock:
+            self._cache.clear()
+            self._cache_ts.clear()
+    
     def init_database(self):
         """Inicializar tabla de contactos"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            # Crear tabla si no existe
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS contactos (
-                    id SERIAL PRIMARY KEY,
-                    timestamp VARCHAR(255) UNIQUE NOT NULL,
-                    nombre VARCHAR(255) NOT NULL,
-                    email VARCHAR(255),
-                    telefono VARCHAR(255),
-                    estado VARCHAR(100) DEFAULT 'nuevo',
-                    notas TEXT,
-                    ip_address VARCHAR(45),
-                    user_agent TEXT,
-                    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Crear índices para mejorar rendimiento
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_contactos_timestamp 
-                ON contactos(timestamp)
-            """)
-            
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_contactos_fecha 
-                ON contactos(fecha_creacion)
-            """)
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
+            with self._conn(preparar=False) as conn:
+                cursor = conn.cursor()
+                
+                # Crear tabla si no existe
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS contactos (
+                        id SERIAL PRIMARY KEY,
+                        timestamp VARCHAR(255) UNIQUE NOT NULL,
+                        nombre VARCHAR(255) NOT NULL,
+                        email VARCHAR(255),
+                        telefono VARCHAR(255),
+                        estado VARCHAR(100) DEFAULT 'nuevo',
+                        notas TEXT,
+                        ip_address VARCHAR(45),
+                        user_agent TEXT,
+                        fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                
+                # Clave asignada por el servidor: UUID, sin colisiones entre
+                # inserts concurrentes (un reloj en ms no es único)
+                cursor.execute("""
+                    ALTER TABLE contactos ALTER COLUMN timestamp SET DEFAULT
+                    gen_random_uuid()::text
+                """)
+                
+                # Crear índices para mejorar rendimiento
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_contactos_timestamp 
+                    ON contactos(timestamp)
+                """)
+                
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_contactos_fecha 
+                    ON contactos(fecha_creacion)
+                """)
+                
+                # GROUP BY estado en estadísticas
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_contactos_estado 
+                    ON contactos(estado)
+                """)
+                
+                # Paginación por fecha descendente (cubre últimos contactos)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_contactos_fecha_desc 
+                    ON contactos(fecha_creacion DESC) INCLUDE (nombre, email)
+                """)
+                
+                # Keyset (fecha_creacion, id): id desempata filas del mismo lote
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_contactos_fecha_id_desc 
+                    ON contactos(fecha_creacion DESC, id DESC)
+                """)
+                
+                # BRIN: índice mínimo para el filtro de últimos 30 días
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_contactos_fecha_brin 
+                    ON contactos USING BRIN (fecha_creacion)
+                """)
+                
+                conn.commit()
+                cursor.close()
             logging.info("✅ Base de datos PostgreSQL inicializada correctamente")
             
         except Exception as e:
@@ -101,88 +283,259 @@ class PostgreSQLStorageManager:
             raise
     
     def guardar_contacto(self, datos):
-        """Guardar nuevo contacto"""
+        """Guardar contacto; devuelve {'id', 'timestamp'} o None si falla.
+        
+        Sin 'timestamp' en datos, PostgreSQL asigna la clave (columna con
+        DEFAULT); con 'timestamp' explícito se actualiza el existente.
+        """
+        valores = (
+            datos.get('nombre'),
+            datos.get('email'),
+            datos.get('telefono'),
+            datos.get('estado', 'nuevo'),
+            datos.get('notas'),
+            datos.get('ip_address'),
+            datos.get('user_agent')
+        )
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
+            with self._conn() as conn:
+                cursor = conn.cursor(cursor_factory=RealDictCursor)
+                
+                if datos.get('timestamp'):
+                    cursor.execute(
+                        "EXECUTE ins_contacto (%s, %s, %s, %s, %s, %s, %s, %s)",
+                        (datos.get('timestamp'),) + valores
+                    )
+                else:
+                    cursor.execute(
+                        "EXECUTE ins_contacto_auto (%s, %s, %s, %s, %s, %s, %s)",
+                        valores
+                    )
+                
+                guardado = cursor.fetchone()
+                self._notificar(cursor, guardado['timestamp'])
+                conn.commit()
+                cursor.close()
             
-            cursor.execute("""
-                INSERT INTO contactos (
-                    timestamp, nombre, email, telefono, estado, notas, 
-                    ip_address, user_agent, fecha_creacion, fecha_actualizacion
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (timestamp) DO UPDATE SET
-                    nombre = EXCLUDED.nombre,
-                    email = EXCLUDED.email,
-                    telefono = EXCLUDED.telefono,
-                    estado = EXCLUDED.estado,
-                    notas = EXCLUDED.notas,
-                    fecha_actualizacion = CURRENT_TIMESTAMP
-            """, (
-                datos.get('timestamp'),
-                datos.get('nombre'),
-                datos.get('email'),
-                datos.get('telefono'),
-                datos.get('estado', 'nuevo'),
-                datos.get('notas'),
-                datos.get('ip_address'),
-                datos.get('user_agent'),
-                datetime.now(),
-                datetime.now()
-            ))
+            self._cache_clear()
+            logging.info(f"✅ Contacto guardado: {datos.get('nombre', 'Sin nombre')}")
+            return guardado
             
-            conn.commit()
-            cursor.close()
-            conn.close()
+        except Exception as e:
+            logging.error(f"❌ Error guardando contacto: {e}")
+            return None
+    
+    def guardar_contactos_bulk(self, lista_datos):
+        """Guardar varios contactos en una sola transacción.
+        Con 'timestamp' explícito se actualiza el existente; sin él,
+        PostgreSQL asigna la clave y la fila siempre es nueva."""
+        try:
+            con_clave, sin_clave = [], []
+            for datos in lista_datos:
+                valores = (
+                    datos.get('nombre'),
+                    datos.get('email'),
+                    datos.get('telefono'),
+                    datos.get('estado', 'nuevo'),
+                    datos.get('notas'),
+                    datos.get('ip_address'),
+                    datos.get('user_agent')
+                )
+                if datos.get('timestamp'):
+                    con_clave.append((datos['timestamp'],) + valores)
+                else:
+                    sin_clave.append(valores)
+            filas = len(con_clave) + len(sin_clave)
+            
+            with self._conn() as conn:
+                cursor = conn.cursor()
+                
+                if con_clave:
+                    execute_values(cursor, """
+                        INSERT INTO contactos (
+                            timestamp, nombre, email, telefono, estado, notas, 
+                            ip_address, user_agent
+                        ) VALUES %s
+                        ON CONFLICT (timestamp) DO UPDATE SET
+                            nombre = EXCLUDED.nombre,
+                            email = EXCLUDED.email,
+                            telefono = EXCLUDED.telefono,
+                            estado = EXCLUDED.estado,
+                            notas = EXCLUDED.notas,
+                            fecha_actualizacion = CURRENT_TIMESTAMP
+                    """, con_clave, page_size=BULK_BATCH_SIZE)
+                
+                if sin_clave:
+                    execute_values(cursor, """
+                        INSERT INTO contactos (
+                            nombre, email, telefono, estado, notas, 
+                            ip_address, user_agent
+                        ) VALUES %s
+                    """, sin_clave, page_size=BULK_BATCH_SIZE)
+                
+                self._notificar(cursor, 'bulk')
+                conn.commit()
+                cursor.close()
             
-            logging.info(f"✅ Contacto guardado: {datos.get('nombre', 'Sin nombre')}")
+            self._cache_clear()
+            logging.info(f"✅ {filas} contactos guardados en bloque")
             return True
             
         except Exception as e:
-            logging.error(f"❌ Error guardando contacto: {e}")
+            logging.error(f"❌ Error guardando contactos en bloque: {e}")
             return False
     
-    def obtener_todos_contactos(self):
-        """Obtener todos los contactos"""
+    def copiar_contactos_bulk(self, lista_datos):
+        """Importar contactos con COPY vía tabla staging.
+        Filas con timestamp: upsert por timestamp; sin timestamp: clave del servidor."""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            
-            cursor.execute("""
-                SELECT id, timestamp, nombre, email, telefono, estado, notas,
-                       ip_address, user_agent, fecha_creacion, fecha_actualizacion
-                FROM contactos 
-                ORDER BY fecha_creacion DESC
-            """)
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            for datos in lista_datos:
+                writer.writerow((
+                    datos.get('timestamp'),
+                    datos.get('nombre'),
+                    datos.get('email'),
+                    datos.get('telefono'),
+                    datos.get('estado', 'nuevo'),
+                    datos.get('notas'),
+                    datos.get('ip_address'),
+                    datos.get('user_agent')
+                ))
+            buf.seek(0)
+            
+            with self._conn() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("""
+                    CREATE TEMP TABLE contactos_stage (
+                        timestamp VARCHAR(255),
+                        nombre VARCHAR(255),
+                        email VARCHAR(255),
+                        telefono VARCHAR(255),
+                        estado VARCHAR(100),
+                        notas TEXT,
+                        ip_address VARCHAR(45),
+                        user_agent TEXT
+                    ) ON COMMIT DROP
+                """)
+                cursor.copy_expert("""
+                    COPY contactos_stage (
+                        timestamp, nombre, email, telefono, estado, notas, 
+                        ip_address, user_agent
+                    ) FROM STDIN WITH CSV
+                """, buf)
+                cursor.execute("""
+                    INSERT INTO contactos (
+                        timestamp, nombre, email, telefono, estado, notas, 
+                        ip_address, user_agent
+                    )
+                    SELECT DISTINCT ON (timestamp)
+                        timestamp, nombre, email, telefono, estado, notas, 
+                        ip_address, user_agent
+                    FROM contactos_stage
+                    WHERE timestamp IS NOT NULL
+                    ON CONFLICT (timestamp) DO UPDATE SET
+                        nombre = EXCLUDED.nombre,
+                        email = EXCLUDED.email,
+                        telefono = EXCLUDED.telefono,
+                        estado = EXCLUDED.estado,
+                        notas = EXCLUDED.notas,
+                        fecha_actualizacion = CURRENT_TIMESTAMP
+                """)
+                filas = cursor.rowcount
+                # Sin clave: el DEFAULT de la columna asigna una nueva a cada fila
+                cursor.execute("""
+                    INSERT INTO contactos (
+                        nombre, email, telefono, estado, notas, 
+                        ip_address, user_agent
+                    )
+                    SELECT nombre, email, telefono, estado, notas, 
+                           ip_address, user_agent
+                    FROM contactos_stage
+                    WHERE timestamp IS NULL
+                """)
+                filas += cursor.rowcount
+                
+                self._notificar(cursor, 'bulk')
+                conn.commit()
+                cursor.close()
             
-            contactos = cursor.fetchall()
+            self._cache_clear()
+            logging.info(f"✅ {filas} contactos importados con COPY")
+            return filas
             
-            cursor.close()
-            conn.close()
+        except Exception as e:
+            logging.error(f"❌ Error importando contactos con COPY: {e}")
+            return None
+    
+    def obtener_todos_contactos(self, limit=100, before=None):
+        """Obtener contactos paginados (keyset sobre (fecha_creacion, id)).
+        `before` es None o la tupla (fecha_creacion, id) de la última fila vista."""
+        # Solo la primera página va a cache: los cursores los elige el cliente
+        cache_key = ('todos', limit) if before is None else None
+        if cache_key is not None:
+            cacheado = self._cache_get(cache_key)
+            if cacheado is not None:
+                return cacheado
+        
+        try:
+            with self._conn() as conn:
+                cursor = conn.cursor(cursor_factory=RealDictCursor)
+                
+                fecha, ident = before or (None, None)
+                cursor.execute("EXECUTE sel_contactos (%s, %s, %s)", (fecha, ident, limit))
+                
+                contactos = cursor.fetchall()
+                cursor.close()
             
-            # Convertir a lista de diccionarios para JSON
-            return [dict(contacto) for contacto in contactos]
+            # RealDictRow ya es un dict: se serializa sin copiar cada fila
+            if cache_key is not None:
+                self._cache_set(cache_key, contactos)
+            return contactos
             
         except Exception as e:
             logging.error(f"❌ Error obteniendo contactos: {e}")
             return []
     
+    def iterar_contactos(self):
+        """Recorrer todos los contactos con un cursor server-side (sin cargar la tabla)"""
+        with self._conn() as conn:
+            cursor = conn.cursor(name='stream_contactos', cursor_factory=RealDictCursor)
+            cursor.itersize = STREAM_ITERSIZE
+            try:
+                cursor.execute("""
+                    SELECT id, timestamp, nombre, email, telefono, estado, notas,
+                           ip_address, user_agent, fecha_creacion, fecha_actualizacion
+                    FROM contactos 
+                    ORDER BY fecha_creacion DESC
+                """)
+                yield from cursor
+            finally:
+                cursor.close()
+                conn.rollback()
+    
+    def contar_contactos(self):
+        """Contar contactos sin traer las filas"""
+        with self._conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM contactos")
+            total = cursor.fetchone()[0]
+            cursor.close()
+        return total
+    
     def obtener_contacto_por_id(self, timestamp):
         """Obtener contacto específico por timestamp"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            
-            cursor.execute("""
-                SELECT * FROM contactos WHERE timestamp = %s
-            """, (timestamp,))
-            
-            contacto = cursor.fetchone()
-            
-            cursor.close()
-            conn.close()
+            with self._conn() as conn:
+                cursor = conn.cursor(cursor_factory=RealDictCursor)
+                
+                cursor.execute("EXECUTE sel_contacto (%s)", (timestamp,))
+                
+                contacto = cursor.fetchone()
+                cursor.close()
             
-            return dict(contacto) if contacto else None
+            return contacto
             
         except Exception as e:
             logging.error(f"❌ Error obteniendo contacto: {e}")
@@ -191,33 +544,19 @@ class PostgreSQLStorageManager:
     def actualizar_contacto(self, timestamp, datos_actualizados):
         """Actualizar contacto existente"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            campos_actualizar = []
-            valores = []
-            
-            for campo in ['nombre', 'email', 'telefono', 'estado', 'notas']:
-                if campo in datos_actualizados:
-                    campos_actualizar.append(f"{campo} = %s")
-                    valores.append(datos_actualizados[campo])
-            
-            if campos_actualizar:
-                valores.append(datetime.now())
-                valores.append(timestamp)
-                
-                query = f"""
-                    UPDATE contactos 
-                    SET {', '.join(campos_actualizar)}, fecha_actualizacion = %s 
-                    WHERE timestamp = %s
-                """
+            with self._conn() as conn:
+                cursor = conn.cursor()
                 
-                cursor.execute(query, valores)
+                cursor.execute(
+                    "EXECUTE upd_contacto (%s, %s, %s, %s, %s, %s)",
+                    tuple(datos_actualizados.get(campo) for campo in
+                          ('nombre', 'email', 'telefono', 'estado', 'notas')) + (timestamp,)
+                )
+                self._notificar(cursor, timestamp)
                 conn.commit()
+                cursor.close()
             
-            cursor.close()
-            conn.close()
-            
+            self._cache_clear()
             logging.info(f"✅ Contacto actualizado: {timestamp}")
             return True
             
@@ -228,16 +567,17 @@ class PostgreSQLStorageManager:
     def eliminar_contacto(self, timestamp):
         """Eliminar contacto"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("DELETE FROM contactos WHERE timestamp = %s", (timestamp,))
-            filas_afectadas = cursor.rowcount
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
+            with self._conn() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("EXECUTE del_contacto (%s)", (timestamp,))
+                filas_afectadas = cursor.rowcount
+                
+                self._notificar(cursor, timestamp)
+                conn.commit()
+                cursor.close()
             
+            self._cache_clear()
             logging.info(f"✅ Contacto eliminado: {timestamp} ({filas_afectadas} filas)")
             return filas_afectadas > 0
             
@@ -248,18 +588,18 @@ class PostgreSQLStorageManager:
     def limpiar_todos_contactos(self):
         """Eliminar todos los contactos"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT COUNT(*) FROM contactos")
-            total = cursor.fetchone()[0]
-            
-            cursor.execute("DELETE FROM contactos")
-            conn.commit()
-            
-            cursor.close()
-            conn.close()
+            with self._conn() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("SELECT COUNT(*) FROM contactos")
+                total = cursor.fetchone()[0]
+                
+                cursor.execute("DELETE FROM contactos")
+                self._notificar(cursor, 'clear')
+                conn.commit()
+                cursor.close()
             
+            self._cache_clear()
             logging.info(f"✅ {total} contactos eliminados")
             return total
             
@@ -269,51 +609,54 @@ class PostgreSQLStorageManager:
     
     def obtener_estadisticas(self):
         """Obtener estadísticas de contactos"""
+        cacheado = self._cache_get('estadisticas')
+        if cacheado is not None:
+            return cacheado
+        
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            
-            # Total de contactos
-            cursor.execute("SELECT COUNT(*) as total FROM contactos")
-            total = cursor.fetchone()['total']
-            
-            # Contactos por estado
-            cursor.execute("""
-                SELECT estado, COUNT(*) as cantidad 
-                FROM contactos 
-                GROUP BY estado 
-                ORDER BY cantidad DESC
-            """)
-            por_estado = cursor.fetchall()
-            
-            # Contactos por día (últimos 30 días)
-            cursor.execute("""
-                SELECT DATE(fecha_creacion) as fecha, COUNT(*) as cantidad
-                FROM contactos 
-                WHERE fecha_creacion >= CURRENT_DATE - INTERVAL '30 days'
-                GROUP BY DATE(fecha_creacion)
-                ORDER BY fecha DESC
-            """)
-            por_dia = cursor.fetchall()
-            
-            # Últimos contactos
-            cursor.execute("""
-                SELECT nombre, email, fecha_creacion 
-                FROM contactos 
-                ORDER BY fecha_creacion DESC 
-                LIMIT 5
-            """)
-            ultimos = cursor.fetchall()
-            
-            cursor.close()
-            conn.close()
-            
-            return {
-                'total': total,
-                'por_estado': [dict(row) for row in por_estado],
-                'por_dia': [dict(row) for row in por_dia],
-                'ultimos': [dict(row) for row in ultimos]
-            }
+            with self._conn() as conn:
+                cursor = conn.cursor(cursor_factory=RealDictCursor)
+                
+                # Una sola ida y vuelta: cada agregado como JSON
+                cursor.execute("""
+                    WITH
+                      t AS (SELECT COUNT(*) AS total FROM contactos),
+                      e AS (
+                        SELECT COALESCE(json_agg(row_to_json(x)), '[]') AS por_estado
+                        FROM (
+                          SELECT estado, COUNT(*) AS cantidad
+                          FROM contactos
+                          GROUP BY estado
+                          ORDER BY cantidad DESC
+                        ) x
+                      ),
+                      d AS (
+                        SELECT COALESCE(json_agg(row_to_json(y)), '[]') AS por_dia
+                        FROM (
+                          SELECT DATE(fecha_creacion) AS fecha, COUNT(*) AS cantidad
+                          FROM contactos
+                          WHERE fecha_creacion >= CURRENT_DATE - INTERVAL '30 days'
+                          GROUP BY 1
+                          ORDER BY 1 DESC
+                        ) y
+                      ),
+                      u AS (
+                        SELECT COALESCE(json_agg(row_to_json(z)), '[]') AS ultimos
+                        FROM (
+                          SELECT nombre, email, fecha_creacion
+                          FROM contactos
+                          ORDER BY fecha_creacion DESC
+                          LIMIT 5
+                        ) z
+                      )
+                    SELECT t.total, e.por_estado, d.por_dia, u.ultimos
+                    FROM t, e, d, u
+                """)
+                resultado = cursor.fetchone()
+                cursor.close()
+            
+            self._cache_set('estadisticas', resultado)
+            return resultado
             
         except Exception as e:
             logging.error(f"❌ Error obteniendo estadísticas: {e}")
@@ -330,11 +673,11 @@ storage_manager = PostgreSQLStorageManager()
 def health_check():
     """Health check para Render"""
     try:
-        contactos = storage_manager.obtener_todos_contactos()
+        total = storage_manager.contar_contactos()
         return jsonify({
             'status': 'healthy',
             'message': 'Servidor funcionando correctamente',
-            'total_contactos': len(contactos),
+            'total_contactos': total,
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
@@ -352,10 +695,14 @@ def home():
         'endpoints': [
             'GET /health',
             'POST /api/guardar-contacto',
-            'GET /api/obtener-consultas',
+            'GET /api/obtener-consultas?limit=&before=',
             'GET /api/resumen',
-            'GET /admin/data/<token>',
+            'GET /admin/data/<token>?limit=&before=',
+            'GET /admin/export/<token>',
+            'GET /admin/stream/<token>',
             'POST /admin/add/<token>',
+            'POST /admin/bulk_add/<token>',
+            'POST /admin/bulk_copy/<token>',
             'PUT /admin/update/<token>',
             'DELETE /admin/delete/<token>',
             'DELETE /admin/clear/<token>'
@@ -366,6 +713,26 @@ def home():
 # RUTAS PÚBLICAS DE LA API
 # ============================================================================
 
+def _parametros_paginacion():
+    """Leer ?limit=&before= de la query string.
+    El cursor es '<fecha_creacion ISO>,<id>'; ValueError si está mal formado."""
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    before = request.args.get('before') or None
+    if before is not None:
+        fecha, _, ident = before.rpartition(',')
+        if not fecha or not ident.isdigit():
+            raise ValueError('Cursor de paginación inválido')
+        before = (fecha, int(ident))
+    return limit, before
+
+def _respuesta_paginada(contactos, limit):
+    """Armar respuesta con el cursor para la página siguiente"""
+    next_cursor = None
+    if len(contactos) == limit:
+        ultimo = contactos[-1]
+        next_cursor = f"{ultimo['fecha_creacion'].isoformat()},{ultimo['id']}"
+    return jsonify({'success': True, 'data': contactos, 'next_cursor': next_cursor})
+
 @app.route('/api/guardar-contacto', methods=['POST'])
 def guardar_contacto():
     """Guardar nuevo contacto desde formulario web"""
@@ -375,18 +742,19 @@ def guardar_contacto():
         if not datos or not datos.get('nombre'):
             return jsonify({'success': False, 'error': 'Datos incompletos'}), 400
         
-        # Agregar metadatos
-        datos['timestamp'] = str(int(time.time() * 1000))
+        # Agregar metadatos (el timestamp lo asigna PostgreSQL)
+        datos.pop('timestamp', None)
         datos['ip_address'] = request.remote_addr
         datos['user_agent'] = request.headers.get('User-Agent', '')
         
         # Guardar en base de datos
-        if storage_manager.guardar_contacto(datos):
+        guardado = storage_manager.guardar_contacto(datos)
+        if guardado:
             logging.info(f"✅ Nuevo contacto guardado: {datos['nombre']}")
             return jsonify({
                 'success': True, 
                 'message': 'Contacto guardado correctamente',
-                'timestamp': datos['timestamp']
+                'timestamp': guardado['timestamp']
             })
         else:
             return jsonify({'success': False, 'error': 'Error guardando contacto'}), 500
@@ -397,10 +765,13 @@ def guardar_contacto():
 
 @app.route('/api/obtener-consultas', methods=['GET'])
 def obtener_consultas():
-    """Obtener todas las consultas"""
+    """Obtener las consultas paginadas"""
     try:
-        contactos = storage_manager.obtener_todos_contactos()
-        return jsonify({'success': True, 'data': contactos})
+        limit, before = _parametros_paginacion()
+        contactos = storage_manager.obtener_todos_contactos(limit, before)
+        return _respuesta_paginada(contactos, limit)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         logging.error(f"❌ Error obteniendo consultas: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -419,50 +790,165 @@ def obtener_resumen():
 # RUTAS ADMINISTRATIVAS (PROTEGIDAS)
 # ============================================================================
 
+_ADMIN_TOKEN_BYTES = ADMIN_TOKEN.encode()
+_cupos_stream = threading.BoundedSemaphore(SSE_MAX_SUBSCRIBERS)
+
+def require_admin(f):
+    """Validar <token> de la URL en tiempo constante y quitarlo de los kwargs"""
+    @wraps(f)
+    def wrapper(token, *args, **kwargs):
+        if not compare_digest(token.encode(), _ADMIN_TOKEN_BYTES):
+            return jsonify({'error': 'Acceso no autorizado'}), 403
+        return f(*args, **kwargs)
+    return wrapper
+
+def _preparar_lote(lista_datos):
+    """Validar un array de contactos y completar el estado.
+    Las filas sin 'timestamp' reciben la clave de PostgreSQL al insertarse.
+    Devuelve un mensaje de error o None si el lote es válido."""
+    if not isinstance(lista_datos, list) or not lista_datos:
+        return 'Se espera un array de contactos'
+    
+    if any(not isinstance(d, dict) or not d.get('nombre') for d in lista_datos):
+        return 'Nombre es requerido en todos los contactos'
+    
+    for datos in lista_datos:
+        datos['estado'] = datos.get('estado', 'nuevo')
+    return None
+
 @app.route('/admin/data/<token>')
-def obtener_datos_admin(token):
+@require_admin
+def obtener_datos_admin():
     """Obtener todos los contactos para admin"""
-    if token != ADMIN_TOKEN:
-        return jsonify({'error': 'Acceso no autorizado'}), 403
-    
     try:
-        contactos = storage_manager.obtener_todos_contactos()
-        return jsonify({'success': True, 'data': contactos})
+        limit, before = _parametros_paginacion()
+        contactos = storage_manager.obtener_todos_contactos(limit, before)
+        return _respuesta_paginada(contactos, limit)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/admin/stream/<token>', methods=['GET'])
+@require_admin
+def stream_contactos():
+    """Server-sent events: avisa cada cambio en contactos (LISTEN/NOTIFY).
+    Cada suscriptor ocupa un hilo del worker y una conexión a PostgreSQL,
+    por eso hay un cupo de SSE_MAX_SUBSCRIBERS por proceso."""
+    if not _cupos_stream.acquire(blocking=False):
+        return jsonify({'error': 'Demasiados suscriptores, reintente más tarde'}), 503
+    
+    def eventos():
+        # Conexión dedicada fuera del pool: queda escuchando mientras dure el stream
+        conn = psycopg2.connect(DATABASE_URL)
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"LISTEN {CANAL_CAMBIOS}")
+            while True:
+                if select.select([conn], [], [], SSE_KEEPALIVE) == ([], [], []):
+                    yield ': keepalive\n\n'
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    aviso = conn.notifies.pop(0)
+                    yield f"data: {aviso.payload}\n\n"
+        finally:
+            conn.close()
+    
+    respuesta = Response(eventos(), mimetype='text/event-stream',
+                         headers={'Cache-Control': 'no-cache'})
+    # Se libera al cerrar la respuesta, aunque el generador no llegue a arrancar
+    respuesta.call_on_close(_cupos_stream.release)
+    return respuesta
+
+@app.route('/admin/export/<token>')
+@require_admin
+def exportar_datos_admin():
+    """Todos los contactos como JSON en streaming (memoria constante)"""
+    def generar():
+        yield '{"success":true,"data":['
+        separador = ''
+        for contacto in storage_manager.iterar_contactos():
+            yield separador + orjson.dumps(contacto).decode()
+            separador = ','
+        yield ']}'
+    
+    return Response(generar(), mimetype='application/json')
+
 @app.route('/admin/add/<token>', methods=['POST'])
-def agregar_contacto_admin(token):
+@require_admin
+def agregar_contacto_admin():
     """Agregar nuevo contacto desde admin"""
-    if token != ADMIN_TOKEN:
-        return jsonify({'error': 'Acceso no autorizado'}), 403
-    
     try:
         datos = request.get_json()
         
         if not datos or not datos.get('nombre'):
             return jsonify({'error': 'Nombre es requerido'}), 400
         
-        # Agregar timestamp si no existe
-        if 'timestamp' not in datos:
-            datos['timestamp'] = str(int(time.time() * 1000))
-        
         datos['estado'] = datos.get('estado', 'nuevo')
         
-        if storage_manager.guardar_contacto(datos):
-            return jsonify({'success': True, 'message': 'Contacto agregado correctamente'})
+        guardado = storage_manager.guardar_contacto(datos)
+        if guardado:
+            return jsonify({
+                'success': True,
+                'message': 'Contacto agregado correctamente',
+                'timestamp': guardado['timestamp']
+            })
         else:
             return jsonify({'error': 'Error guardando contacto'}), 500
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/admin/bulk_add/<token>', methods=['POST'])
+@require_admin
+def agregar_contactos_bulk_admin():
+    """Agregar varios contactos (array JSON) desde admin"""
+    try:
+        lista_datos = request.get_json()
+        error = _preparar_lote(lista_datos)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        for i in range(0, len(lista_datos), BULK_BATCH_SIZE):
+            if not storage_manager.guardar_contactos_bulk(lista_datos[i:i + BULK_BATCH_SIZE]):
+                return jsonify({'error': 'Error guardando contactos', 'guardados': i}), 500
+        
+        return jsonify({
+            'success': True,
+            'message': f'{len(lista_datos)} contactos agregados correctamente'
+        })
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/admin/bulk_copy/<token>', methods=['POST'])
+@require_admin
+def copiar_contactos_bulk_admin():
+    """Importar un array JSON grande de contactos usando COPY"""
+    try:
+        lista_datos = request.get_json()
+        error = _preparar_lote(lista_datos)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        filas = storage_manager.copiar_contactos_bulk(lista_datos)
+        if filas is None:
+            return jsonify({'error': 'Error importando contactos'}), 500
+        
+        return jsonify({
+            'success': True,
+            'message': f'{filas} contactos importados correctamente'
+        })
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/admin/update/<token>', methods=['PUT'])
-def actualizar_contacto_admin(token):
+@require_admin
+def actualizar_contacto_admin():
     """Actualizar contacto existente desde admin"""
-    if token != ADMIN_TOKEN:
-        return jsonify({'error': 'Acceso no autorizado'}), 403
-    
     try:
         datos = request.get_json()
         contacto_id = datos.get('timestamp')
@@ -479,11 +965,9 @@ def actualizar_contacto_admin(token):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/admin/delete/<token>', methods=['DELETE'])
-def eliminar_contacto_admin(token):
+@require_admin
+def eliminar_contacto_admin():
     """Eliminar contacto desde admin"""
-    if token != ADMIN_TOKEN:
-        return jsonify({'error': 'Acceso no autorizado'}), 403
-    
     try:
         datos = request.get_json()
         contacto_id = datos.get('timestamp')
@@ -500,11 +984,9 @@ def eliminar_contacto_admin(token):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/admin/clear/<token>', methods=['DELETE'])
-def limpiar_datos_admin(token):
+@require_admin
+def limpiar_datos_admin():
     """Limpiar todos los datos desde admin"""
-    if token != ADMIN_TOKEN:
-        return jsonify({'error': 'Acceso no autorizado'}), 403
-    
     try:
         total_eliminados = storage_manager.limpiar_todos_contactos()
         return jsonify({
@@ -520,4 +1002,5 @@ def limpiar_datos_admin(token):
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    # threaded=True: cada request en su hilo, las esperas a PostgreSQL se solapan
+    app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
\ No newline at end of file
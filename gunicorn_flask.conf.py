@@ -0,0 +1,20 @@
+# Configuración de gunicorn para los servidores Flask (main.py / servidor_excel.py)
+# Se pasa explícitamente con -c (procfile.txt, dockerfile): con otro nombre que
+# gunicorn.conf.py no se aplica sola a las otras apps (Procfile, DOCKERFILE.txt).
+# Los flags de la línea de comandos tienen prioridad sobre estos valores.
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Workers preforkeados + hilos: las esperas a Gemini y a disco se solapan.
+# Default fijo y chico: en contenedores cpu_count() ve los CPUs del host y cada
+# worker carga pandas/numpy y la caché SoA; escalar con WEB_CONCURRENCY.
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = 4
+
+# create_app() corre una vez en el master antes del fork
+preload_app = True
+
+# Las respuestas de Gemini pueden tardar
+timeout = 120
@@ -1,7 +1,17 @@
 import sqlite3
 import os
-import json
-from typing import List, Dict, Any, Optional
+import orjson
+import operator
+import numpy as np
+from hashlib import blake2b
+import queue
+import threading
+import atexit
+import unicodedata
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import List, Dict, Any, Iterator, Optional
 
 DB_PATH = "dante_properties.db"
 LOG_PATH = "conversation_logs.db"
@@ -9,7 +19,6 @@ LOG_PATH = "conversation_logs.db"
 
 import sqlite3
 import os
-import json
 from typing import List, Dict, Any, Optional
 
 # ✅ USAR RUTA PERSISTENTE EN RENDER
@@ -19,18 +28,105 @@ LOG_PATH = os.path.join(os.getcwd(), "instance", "conversation_logs.db")
 # Crear directorio instance si no existe
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
+def _json_converter(valor: bytes) -> Any:
+    """Convierte columnas declaradas JSON al leerlas (lista vacía si falla)"""
+    try:
+        return orjson.loads(valor)
+    except orjson.JSONDecodeError:
+        return []
+
+sqlite3.register_converter("JSON", _json_converter)
+
+# Columnas multimedia guardadas como JSON
+JSON_COLUMNS = ('fotos', 'videos', 'documentos', 'imagenes_360')
+
+def _configure(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """Aplica PRAGMAs de rendimiento (WAL, sync NORMAL, cache en memoria)"""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-64000")
+    conn.execute("PRAGMA mmap_size=268435456")
+    return conn
+
+# Lectores: pool de conexiones con query_only (conservan su page cache).
+# Escritor: una sola conexión por archivo, serializada con su lock.
+POOL_SIZE = 4
+_read_pools = {DB_PATH: queue.Queue(), LOG_PATH: queue.Queue()}
+_write_conns = {}
+_write_locks = {DB_PATH: threading.RLock(), LOG_PATH: threading.RLock()}
+
+def _connect(path: str, query_only: bool) -> sqlite3.Connection:
+    conn = _configure(sqlite3.connect(path, check_same_thread=False, cached_statements=512,
+                                      detect_types=sqlite3.PARSE_DECLTYPES))
+    if query_only:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+@contextmanager
+def get_conn(path: str, write: bool = False):
+    """Conexión para `path`: de lectura (pool, query_only) o la de escritura.
+    Con write=True serializa contra los demás escritores del mismo archivo."""
+    if write:
+        with _write_locks[path]:
+            conn = _write_conns.get(path)
+            if conn is None:
+                conn = _write_conns[path] = _connect(path, query_only=False)
+            try:
+                yield conn
+                if conn.in_transaction:
+                    conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return
+    
+    pool = _read_pools[path]
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = _connect(path, query_only=True)
+    try:
+        yield conn
+    finally:
+        if pool.qsize() < POOL_SIZE:
+            pool.put(conn)
+        else:
+            conn.close()
+
+def _close_pool(path: str):
+    """Cierra los lectores ociosos del pool (liberan el lock compartido de WAL)"""
+    pool = _read_pools[path]
+    while True:
+        try:
+            pool.get_nowait().close()
+        except queue.Empty:
+            return
+
+def close_connections():
+    """Cierra lectores y escritores de ambas BDs. Llamar antes de un fork
+    (gunicorn preload_app): una conexión SQLite no se comparte entre procesos."""
+    for path in (DB_PATH, LOG_PATH):
+        _close_pool(path)
+        with _write_locks[path]:
+            conn = _write_conns.pop(path, None)
+            if conn is not None:
+                conn.close()
+
 def initialize_databases():
     """Inicializa las bases de datos solo si no existen"""
     try:
         print(f"🔄 INICIALIZANDO BD EN: {DB_PATH}")
+        _close_pool(DB_PATH)
         
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_conn(DB_PATH, write=True) as conn:
             cursor = conn.cursor()
             
             # ✅ VERIFICAR SI LA TABLA EXISTE ANTES DE RECREAR
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='properties'")
             tabla_existe = cursor.fetchone()
             
+            recrear = not tabla_existe
             if tabla_existe:
                 print("✅ Tabla 'properties' ya existe, verificando datos...")
                 cursor.execute("SELECT COUNT(*) FROM properties")
@@ -42,23 +138,30 @@ def initialize_databases():
                 count_alquiler = cursor.fetchone()[0]
                 print(f"   🏠 Propiedades de alquiler: {count_alquiler}")
                 
-                if count_alquiler > 0:
+                problema = _problema_esquema(cursor)
+                if problema:
+                    print(f"⚠️ {problema}, recreando...")
+                    recrear = True
+                elif count_alquiler > 0:
                     print("✅ BD ya tiene propiedades de alquiler, no es necesario recrear")
+                    _create_property_indexes(cursor)
                     return
                 else:
-                    print("⚠️ BD no tiene propiedades de alquiler, recargando datos...")
+                    print("⚠️ BD no tiene propiedades de alquiler, sincronizando datos...")
             else:
                 print("🚨 Tabla 'properties' no existe, creando...")
             
-            # Solo recrear si es necesario
-            cursor.execute("DROP TABLE IF EXISTS properties")
+            # Solo recrear si el esquema no existe o quedó viejo
+            if recrear:
+                cursor.execute("DROP TABLE IF EXISTS properties_fts")
+                cursor.execute("DROP TABLE IF EXISTS properties")
             
-            # CREAR tabla (código existente)
             cursor.execute('''
-                CREATE TABLE properties (
+                CREATE TABLE IF NOT EXISTS properties (
                     id_temporal TEXT PRIMARY KEY,
                     titulo TEXT NOT NULL,
                     barrio TEXT NOT NULL,
+                    barrio_norm TEXT NOT NULL,
                     precio REAL NOT NULL,
                     ambientes INTEGER NOT NULL,
                     metros_cuadrados REAL NOT NULL,
@@ -77,13 +180,14 @@ def initialize_databases():
                     acepta_mascotas TEXT,
                     aire_acondicionado TEXT,
                     info_multimedia TEXT,
-                    documentos TEXT,
-                    videos TEXT,
-                    fotos TEXT,
-                    imagenes_360 TEXT,
+                    documentos JSON,
+                    videos JSON,
+                    fotos JSON,
+                    imagenes_360 JSON,
                     moneda_precio TEXT DEFAULT 'USD',
                     moneda_expensas TEXT DEFAULT 'ARS',
-                    fecha_procesamiento TEXT
+                    fecha_procesamiento TEXT,
+                    content_hash TEXT
                 )
             ''')
             
@@ -94,43 +198,127 @@ def initialize_databases():
                 print("❌ No se pudieron cargar propiedades desde JSON")
                 return
             
-            # Insertar propiedades
-            for prop in propiedades:
+            # Sin journal solo en la carga inicial (tabla recién creada y vacía):
+            # si falla, se vuelve a correr el loader. Sobre una BD viva con
+            # lectores, la sincronización incremental sigue con WAL, porque un
+            # rollback con journal_mode=OFF deja la BD en estado indefinido.
+            carga_inicial = recrear
+            if carga_inicial:
                 try:
-                    # Convertir listas a JSON strings
-                    fotos_json = json.dumps(prop.get('fotos', []))
-                    videos_json = json.dumps(prop.get('videos', []))
-                    documentos_json = json.dumps(prop.get('documentos', []))
-                    imagenes_360_json = json.dumps(prop.get('imagenes_360', []))
-
-                    cursor.execute('''
-                        INSERT INTO properties (
-                            id_temporal, titulo, barrio, precio, ambientes, metros_cuadrados,
-                            descripcion, operacion, tipo, direccion, antiguedad, expensas,
-                            cochera, balcon, pileta, acepta_mascotas, aire_acondicionado,
-                            moneda_precio, moneda_expensas, fotos, videos, documentos, imagenes_360
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        prop.get('id_temporal', f"prop_{hash(prop.get('titulo', ''))}"),
-                        prop['titulo'], prop['barrio'], prop['precio'],
-                        prop['ambientes'], prop['metros_cuadrados'], prop.get('descripcion', ''),
-                        prop['operacion'], prop['tipo'], prop.get('direccion'),
-                        prop.get('antiguedad'), prop.get('expensas'), prop.get('cochera'),
-                        prop.get('balcon'), prop.get('pileta'), prop.get('acepta_mascotas'),
-                        prop.get('aire_acondicionado'), prop.get('moneda_precio', 'USD'),
-                        prop.get('moneda_expensas', 'ARS'),
-                        fotos_json, videos_json, documentos_json, imagenes_360_json
-                    ))
-                except Exception as e:
-                    print(f"⚠️ Error cargando propiedad {prop.get('titulo', 'N/A')}: {e}")
+                    cursor.execute("PRAGMA journal_mode=OFF")
+                except sqlite3.OperationalError:
+                    print("⚠️ Hay lectores abiertos, la carga sigue con WAL")
+                cursor.execute("PRAGMA synchronous=OFF")
+            cursor.execute("PRAGMA foreign_keys=OFF")
+            try:
+                rows = [_property_row(prop) for prop in propiedades]
+                if not conn.in_transaction:
+                    conn.execute("BEGIN")
+                # IDs determinísticos: las filas existentes se ignoran...
+                cursor.executemany(_INSERT_PROPERTY_SQL, rows)
+                insertadas = cursor.rowcount
+                # ...y solo se reescriben las que cambiaron de contenido
+                cursor.executemany(_UPDATE_PROPERTY_SQL,
+                                   (row[1:] + (row[0], row[-1]) for row in rows))
+                actualizadas = cursor.rowcount
+                # ...y se borran las que ya no están en propiedades.json
+                cursor.execute(
+                    "DELETE FROM properties WHERE id_temporal NOT IN (SELECT value FROM json_each(?))",
+                    (orjson.dumps([row[0] for row in rows]).decode(),)
+                )
+                borradas = cursor.rowcount
+                
+                conn.commit()
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                if carga_inicial:
+                    cursor.execute("PRAGMA journal_mode=WAL")
+                    cursor.execute("PRAGMA synchronous=NORMAL")
+                cursor.execute("PRAGMA foreign_keys=ON")
+            print(f"   ➕ {insertadas} nuevas, ✏️ {actualizadas} actualizadas, 🗑️ {borradas} eliminadas")
             
+            # Índice full-text sobre título y descripción (contenido externo)
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS properties_fts USING fts5(
+                    titulo, descripcion, content='properties', content_rowid='rowid'
+                )
+            ''')
+            cursor.execute("INSERT INTO properties_fts(properties_fts) VALUES('rebuild')")
             conn.commit()
+            
+            _create_property_indexes(cursor)
             print(f"✅ Base de datos inicializada con {len(propiedades)} propiedades")
             
     except Exception as e:
         print(f"❌ Error crítico inicializando base de datos: {e}")
 
 
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas y sin acentos: 'Núñez ' -> 'nunez'"""
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).lower().strip()
+
+
+def _create_property_indexes(cursor: sqlite3.Cursor):
+    """Índices para los filtros y el ORDER BY precio de query_properties"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_prop_filter ON properties(operacion, tipo, barrio_norm, precio)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_prop_barrio_norm ON properties(barrio_norm)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_prop_precio ON properties(precio)")
+    cursor.execute("ANALYZE")
+
+
+def _stable_id(titulo: str) -> str:
+    """ID determinístico entre reinicios (hash() de Python cambia por proceso)"""
+    return f"prop_{blake2b(titulo.encode(), digest_size=8).hexdigest()}"
+
+
+# Columnas que se cargan desde el JSON (orden de _property_row)
+_PROPERTY_COLUMNS = (
+    'id_temporal', 'titulo', 'barrio', 'barrio_norm', 'precio', 'ambientes', 'metros_cuadrados',
+    'descripcion', 'operacion', 'tipo', 'direccion', 'antiguedad', 'expensas',
+    'cochera', 'balcon', 'pileta', 'acepta_mascotas', 'aire_acondicionado',
+    'moneda_precio', 'moneda_expensas', 'fotos', 'videos', 'documentos', 'imagenes_360',
+    'content_hash'
+)
+
+# Claves mínimas que debe traer cada propiedad del JSON
+REQUIRED_KEYS = frozenset(('titulo', 'barrio', 'precio', 'ambientes', 'metros_cuadrados',
+                           'operacion', 'tipo'))
+_OPS = frozenset(('venta', 'alquiler'))
+
+# SQL fijo a nivel módulo: sqlite prepara cada sentencia una vez por conexión
+_INSERT_PROPERTY_SQL = (
+    f"INSERT OR IGNORE INTO properties ({', '.join(_PROPERTY_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(_PROPERTY_COLUMNS))})"
+)
+_UPDATE_PROPERTY_SQL = (
+    f"UPDATE properties SET {', '.join(f'{col} = ?' for col in _PROPERTY_COLUMNS[1:])} "
+    "WHERE id_temporal = ? AND content_hash IS NOT ?"
+)
+
+
+def _property_row(prop: Dict[str, Any]) -> tuple:
+    """Convierte una propiedad del JSON en la tupla de parámetros del INSERT"""
+    return (
+        prop.get('id_temporal') or _stable_id(prop['titulo']),
+        prop['titulo'], prop['barrio'], normalizar_texto(prop['barrio']), prop['precio'],
+        prop['ambientes'], prop['metros_cuadrados'], prop.get('descripcion', ''),
+        prop['operacion'], prop['tipo'], prop.get('direccion'),
+        prop.get('antiguedad'), prop.get('expensas'), prop.get('cochera'),
+        prop.get('balcon'), prop.get('pileta'), prop.get('acepta_mascotas'),
+        prop.get('aire_acondicionado'), prop.get('moneda_precio', 'USD'),
+        prop.get('moneda_expensas', 'ARS'),
+        # Convertir listas a JSON strings
+        orjson.dumps(prop.get('fotos', [])).decode(),
+        orjson.dumps(prop.get('videos', [])).decode(),
+        orjson.dumps(prop.get('documentos', [])).decode(),
+        orjson.dumps(prop.get('imagenes_360', [])).decode(),
+        # Huella del contenido para detectar cambios entre recargas
+        blake2b(orjson.dumps(prop, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+    )
+
+
 def cargar_propiedades_desde_json():
     """Carga propiedades desde el archivo propiedades.json"""
     try:
@@ -140,18 +328,15 @@ def cargar_propiedades_desde_json():
             print(f"❌ Archivo {json_path} no encontrado")
             return None
         
-        with open(json_path, 'r', encoding='utf-8') as f:
-            contenido = f.read().strip()
-            
-        if not contenido:
-            print(f"❌ Archivo {json_path} está vacío")
-            return None
+        # Lectura binaria de una vez: orjson acepta bytes (UTF-8) directamente
+        with open(json_path, 'rb', buffering=0) as f:
+            contenido = f.readall()
         
-        # Intentar parsear como array
+        # Intentar parsear como array (un archivo vacío también es JSON inválido)
         try:
-            propiedades_data = json.loads(contenido)
-        except json.JSONDecodeError as e:
-            print(f"❌ Error parseando JSON: {e}")
+            propiedades_data = orjson.loads(contenido)
+        except orjson.JSONDecodeError as e:
+            print(f"❌ Error parseando JSON en {json_path}: {e}")
             return None
         
         print(f"📁 Archivo {json_path} cargado, analizando estructura...")
@@ -182,13 +367,14 @@ def cargar_propiedades_desde_json():
         contador_operaciones = {'venta': 0, 'alquiler': 0}
         
         for prop in propiedades:
-            if all(key in prop for key in ['titulo', 'barrio', 'precio', 'operacion', 'tipo']):
+            if isinstance(prop, dict) and REQUIRED_KEYS <= prop.keys():
                 propiedades_validas.append(prop)
-                operacion = prop['operacion'].lower()
-                if operacion in contador_operaciones:
-                    contador_operaciones[operacion] += 1
+                op = prop['operacion']
+                if op in _OPS or (op := str(op).lower()) in _OPS:
+                    contador_operaciones[op] += 1
             else:
-                print(f"⚠️ Propiedad incompleta omitida: {prop.get('titulo', 'Sin título')}")
+                titulo = prop.get('titulo', 'Sin título') if isinstance(prop, dict) else 'Sin título'
+                print(f"⚠️ Propiedad incompleta omitida: {titulo}")
         
         print(f"✅ {len(propiedades_validas)} propiedades válidas cargadas")
         print(f"   📊 Venta: {contador_operaciones['venta']}, Alquiler: {contador_operaciones['alquiler']}")
@@ -216,178 +402,411 @@ def obtener_propiedades_ejemplo():
         }
     ]
 
+def _problema_esquema(cursor: sqlite3.Cursor) -> Optional[str]:
+    """Describe por qué la tabla properties no tiene el esquema actual (None si está bien)"""
+    cursor.execute("PRAGMA table_info(properties)")
+    tipos = {col[1]: col[2] for col in cursor.fetchall()}
+    
+    columnas_esenciales = ['id_temporal', 'precio', 'barrio', 'barrio_norm', 'ambientes', 'metros_cuadrados', 'operacion', 'tipo', 'content_hash']
+    faltantes = [col for col in columnas_esenciales if col not in tipos]
+    if faltantes:
+        return f"Columnas faltantes: {faltantes}"
+    if any(tipos.get(col) != 'JSON' for col in JSON_COLUMNS):
+        return "Columnas multimedia sin tipo JSON"
+    return None
+
 def verificar_y_reparar_bd():
     """Verifica y repara la base de datos si es necesario"""
+    reparar = False
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_conn(DB_PATH) as conn:
             cursor = conn.cursor()
             
             # Verificar si la tabla existe
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='properties'")
             if not cursor.fetchone():
                 print("🚨 Tabla 'properties' no existe - recreando BD...")
-                initialize_databases()
-                return
-            
-            # Verificar si tiene columnas esenciales
-            cursor.execute("PRAGMA table_info(properties)")
-            columnas = [col[1] for col in cursor.fetchall()]
-            
-            columnas_esenciales = ['id_temporal', 'precio', 'barrio', 'ambientes', 'metros_cuadrados', 'operacion', 'tipo']
-            faltantes = [col for col in columnas_esenciales if col not in columnas]
-            
-            if faltantes:
-                print(f"🚨 Columnas faltantes: {faltantes} - recreando BD...")
-                initialize_databases()
+                reparar = True
             else:
-                print("✅ Base de datos verificada correctamente")
+                problema = _problema_esquema(cursor)
+                if problema:
+                    print(f"🚨 {problema} - recreando BD...")
+                    reparar = True
+                else:
+                    print("✅ Base de datos verificada correctamente")
                 
     except Exception as e:
         print(f"🚨 Error verificando BD: {e} - recreando...")
+        reparar = True
+    
+    # Fuera del with: la conexión de verificación ya volvió al pool
+    if reparar:
         initialize_databases()
 
-def query_properties(filters: Dict[str, Any]) -> List[Dict]:
-    """Consulta propiedades con filtros"""
-    try:
-        # Asegurar que la BD esté en buen estado
-        verificar_y_reparar_bd()
+# Filtro -> cláusula SQL, en el orden en que se aplican
+_FILTER_CLAUSES = {
+    'neighborhood': "barrio_norm = ?",
+    'barrio': "barrio_norm = ?",
+    'min_price': "precio >= ?",
+    'max_price': "precio <= ?",
+    'min_rooms': "ambientes >= ?",
+    'operacion': "operacion = ?",
+    'tipo': "tipo = ?",
+    'min_sqm': "metros_cuadrados >= ?",
+    'max_sqm': "metros_cuadrados <= ?",
+    'texto': "rowid IN (SELECT rowid FROM properties_fts WHERE properties_fts MATCH ?)",
+}
+
+def _fts_phrase(value: Any) -> str:
+    """Texto libre como frase FTS5 (escapa comillas y operadores)"""
+    return '"' + str(value).replace('"', '""') + '"'
+
+# Transformación del valor según el filtro
+_FILTER_VALUES = {
+    'neighborhood': normalizar_texto,
+    'barrio': normalizar_texto,
+    'texto': _fts_phrase,
+}
+
+# Columnas livianas para listados (sin los blobs JSON de multimedia)
+DEFAULT_SUMMARY_COLUMNS = ('id_temporal', 'titulo', 'barrio', 'precio', 'ambientes',
+                           'metros_cuadrados', 'operacion', 'tipo')
+
+# Columnas que ve el frontend: todo menos las internas de búsqueda/sincronización
+PUBLIC_COLUMNS = tuple(c for c in _PROPERTY_COLUMNS if c not in ('barrio_norm', 'content_hash'))
+
+@lru_cache(maxsize=64)
+def _build_sql(keys: frozenset, columns: Optional[tuple] = None, limitado: bool = False) -> tuple:
+    """SQL y orden de parámetros para un conjunto de filtros activos.
+    El texto es idéntico por combinación, así sqlite reutiliza el statement."""
+    if columns:
+        desconocidas = [c for c in columns if c not in _PROPERTY_COLUMNS]
+        if desconocidas:
+            raise ValueError(f"Columnas desconocidas: {desconocidas}")
+    param_order = tuple(k for k in _FILTER_CLAUSES if k in keys)
+    query = f"SELECT {', '.join(columns) if columns else '*'} FROM properties WHERE 1=1"
+    for k in param_order:
+        query += f" AND {_FILTER_CLAUSES[k]}"
+    query += " ORDER BY precio ASC"
+    if limitado:
+        query += " LIMIT ?"
+    return query, param_order
+
+def iterar_propiedades(filters: Dict[str, Any], columns: Optional[tuple] = None,
+                       limit: Optional[int] = None) -> Iterator[Dict]:
+    """Recorre las propiedades filtradas fila por fila, sin materializar la lista.
+    Mantiene una conexión del pool hasta agotar (o cerrar) el iterador."""
+    with get_conn(DB_PATH) as conn:
+        cursor = conn.cursor()
         
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+        keys = frozenset(k for k in _FILTER_CLAUSES if filters.get(k))
+        query, param_order = _build_sql(keys, tuple(columns) if columns else None, limit is not None)
+        params = [_FILTER_VALUES[k](filters[k]) if k in _FILTER_VALUES else filters[k]
+                  for k in param_order]
+        if limit is not None:
+            params.append(limit)
             
-            query = "SELECT * FROM properties WHERE 1=1"
-            params = []
-            
-            # Aplicar filtros
-            if 'neighborhood' in filters and filters['neighborhood']:
-                query += " AND barrio LIKE ?"
-                params.append(f"%{filters['neighborhood']}%")
-            if 'barrio' in filters and filters['barrio']:
-                query += " AND barrio LIKE ?" 
-                params.append(f"%{filters['barrio']}%")
-            if 'min_price' in filters and filters['min_price']:
-                query += " AND precio >= ?"
-                params.append(filters['min_price'])
-            if 'max_price' in filters and filters['max_price']:
-                query += " AND precio <= ?"
-                params.append(filters['max_price'])
-            if 'min_rooms' in filters and filters['min_rooms']:
-                query += " AND ambientes >= ?"
-                params.append(filters['min_rooms'])
-            if 'operacion' in filters and filters['operacion']:
-                query += " AND operacion = ?"
-                params.append(filters['operacion'])
-            if 'tipo' in filters and filters['tipo']:
-                query += " AND tipo = ?"
-                params.append(filters['tipo'])
-            if 'min_sqm' in filters and filters['min_sqm']:
-                query += " AND metros_cuadrados >= ?"
-                params.append(filters['min_sqm'])
-            if 'max_sqm' in filters and filters['max_sqm']:
-                query += " AND metros_cuadrados <= ?"
-                params.append(filters['max_sqm'])
-                
-            query += " ORDER BY precio ASC"
-                
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            
-            results = []
-            for row in rows:
-                prop = dict(row)
-                # Parsear campos JSON
-                for key in ['fotos', 'videos', 'documentos', 'imagenes_360']:
-                    if key in prop and isinstance(prop[key], str):
-                        try:
-                            prop[key] = json.loads(prop[key])
-                        except json.JSONDecodeError:
-                            prop[key] = [] # Dejar como lista vacía si el parseo falla
-                results.append(prop)
-
-            print(f"🔍 Búsqueda encontrada: {len(results)} propiedades")
-            return results
+        cursor.execute(query, params)
+        try:
+            # Nombres de columna una sola vez por consulta; cada fila es un zip
+            campos = [col[0] for col in cursor.description]
+            # Las columnas JSON ya llegan como listas (converter registrado);
+            # si no se proyectan, sqlite ni siquiera las lee
+            for row in cursor:
+                yield dict(zip(campos, row))
+        finally:
+            # Si el consumidor corta antes, liberar el snapshot de lectura
+            cursor.close()
+
+def query_properties(filters: Dict[str, Any], columns: Optional[tuple] = None,
+                     limit: Optional[int] = None) -> Optional[List[Dict]]:
+    """Consulta propiedades con filtros.
+    `columns` limita el SELECT (p.ej. DEFAULT_SUMMARY_COLUMNS); None trae la fila completa.
+    `limit` corta el resultado en la propia consulta (LIMIT ?).
+    Devuelve None si la consulta falló, para no confundir un error con "sin resultados"."""
+    try:
+        try:
+            results = list(iterar_propiedades(filters, columns, limit))
+        except sqlite3.OperationalError as e:
+            # Tabla o columnas faltantes: reparar y reintentar una vez
+            print(f"🚨 Error de esquema en query_properties: {e} - reparando...")
+            verificar_y_reparar_bd()
+            results = list(iterar_propiedades(filters, columns, limit))
+        
+        print(f"🔍 Búsqueda encontrada: {len(results)} propiedades")
+        return results
             
     except Exception as e:
         print(f"❌ Error en query_properties: {e}")
+        return None
+
+def get_property_detail(id_temporal: str) -> Optional[Dict]:
+    """Ficha completa (con multimedia) de una propiedad por su id"""
+    try:
+        with get_conn(DB_PATH) as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {', '.join(PUBLIC_COLUMNS)} FROM properties WHERE id_temporal = ?",
+                           (id_temporal,))
+            row = cursor.fetchone()
+            return dict(zip(PUBLIC_COLUMNS, row)) if row else None
+    except Exception as e:
+        print(f"❌ Error obteniendo propiedad {id_temporal}: {e}")
+        return None
+
+def propiedades_mtime() -> Optional[tuple]:
+    """Versión en disco de la BD de propiedades: mtime del archivo y de su -wal.
+    Con WAL los commits tocan primero el -wal, por eso no alcanza con el .db."""
+    try:
+        principal = os.stat(DB_PATH).st_mtime_ns
+    except OSError:
+        return None
+    try:
+        wal = os.stat(DB_PATH + "-wal").st_mtime_ns
+    except OSError:
+        wal = 0
+    return (principal, wal)
+
+def _distinct(columna: str) -> List[str]:
+    try:
+        with get_conn(DB_PATH) as conn:
+            cursor = conn.execute(
+                f"SELECT DISTINCT {columna} FROM properties "
+                f"WHERE {columna} IS NOT NULL AND {columna} != '' ORDER BY 1"
+            )
+            return [fila[0] for fila in cursor.fetchall()]
+    except Exception as e:
+        print(f"❌ Error obteniendo valores de {columna}: {e}")
         return []
 
+def distinct_barrios() -> List[str]:
+    """Barrios distintos, ordenados (resuelto en SQLite, no en Python)"""
+    return _distinct("barrio")
+
+def distinct_tipos() -> List[str]:
+    """Tipos de propiedad distintos, ordenados"""
+    return _distinct("tipo")
+
+def count_properties() -> int:
+    """Cantidad total de propiedades"""
+    try:
+        with get_conn(DB_PATH) as conn:
+            return conn.execute("SELECT COUNT(*) FROM properties").fetchone()[0]
+    except Exception as e:
+        print(f"❌ Error contando propiedades: {e}")
+        return 0
+
+# Instantánea columnar (SoA) de las propiedades: un array por columna filtrable,
+# así las combinaciones de filtros se resuelven con máscaras NumPy en C
+_VEC_FILTERS = {
+    'neighborhood': ('barrio_norm', operator.eq),
+    'barrio': ('barrio_norm', operator.eq),
+    'min_price': ('precio', operator.ge),
+    'max_price': ('precio', operator.le),
+    'min_rooms': ('ambientes', operator.ge),
+    'operacion': ('operacion', operator.eq),
+    'tipo': ('tipo', operator.eq),
+    'min_sqm': ('metros_cuadrados', operator.ge),
+    'max_sqm': ('metros_cuadrados', operator.le),
+}
+_VEC_NUMERIC = ('precio', 'ambientes', 'metros_cuadrados')
+_VEC_TEXT = ('barrio_norm', 'operacion', 'tipo')
+
+_soa = (None, None)  # (propiedades_mtime(), arrays)
+_soa_lock = threading.Lock()
+
+def load_soa_cache() -> Dict[str, Any]:
+    """Arrays paralelos de las propiedades (en el orden de query_properties).
+    Se recargan solos cuando cambia la BD en disco."""
+    global _soa
+    mtime = propiedades_mtime()
+    cache_mtime, data = _soa
+    if data is not None and cache_mtime == mtime:
+        return data
+    
+    with _soa_lock:
+        cache_mtime, data = _soa
+        if data is not None and cache_mtime == mtime:
+            return data
+        
+        rows = query_properties({})
+        if rows is None:
+            raise RuntimeError("No se pudo leer la BD de propiedades")
+        data = {'rows': rows}
+        # NULL -> NaN: igual que en SQL, nunca cumple una comparación
+        for col in _VEC_NUMERIC:
+            data[col] = np.array([np.nan if r.get(col) is None else r[col] for r in rows],
+                                 dtype=np.float64)
+        for col in _VEC_TEXT:
+            data[col] = np.array([r.get(col) for r in rows], dtype=object)
+        
+        _soa = (mtime, data)
+        print(f"🧮 Caché columnar cargada: {len(rows)} propiedades")
+        return data
+
+def query_properties_vec(filters: Dict[str, Any], columns: Optional[tuple] = None,
+                         limit: Optional[int] = None) -> List[Dict]:
+    """Mismo contrato que query_properties, resuelto con máscaras sobre la caché SoA.
+    El texto libre (FTS) y los valores no numéricos se delegan a SQLite."""
+    if filters.get('texto'):
+        return query_properties(filters, columns, limit)
+    
+    try:
+        soa = load_soa_cache()
+        rows = soa['rows']
+        mask = np.ones(len(rows), dtype=bool)
+        for key, (col, op) in _VEC_FILTERS.items():
+            value = filters.get(key)
+            if not value:
+                continue
+            if key in _FILTER_VALUES:
+                value = _FILTER_VALUES[key](value)
+            if col in _VEC_NUMERIC:
+                value = float(value)
+            mask &= op(soa[col], value)
+    except (TypeError, ValueError):
+        return query_properties(filters, columns, limit)
+    
+    idx = np.flatnonzero(mask)
+    if limit is not None:
+        idx = idx[:limit]
+    # Copias: la instantánea es compartida entre pedidos
+    if columns:
+        return [{c: rows[i].get(c) for c in columns} for i in idx]
+    return [dict(rows[i]) for i in idx]
+
+_INSERT_LOG_SQL = '''
+    INSERT INTO logs (timestamp, channel, user_message, bot_response, 
+                      response_time, search_performed, results_count)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+def _channel_version(canal: str) -> int:
+    """Versión del historial de un canal: el último id de log escrito.
+    Sale de la BD y no de un contador en memoria, así un worker ve también los
+    logs que escribieron los otros procesos (lookup indexado por idx_logs_channel_id)."""
+    with get_conn(LOG_PATH) as conn:
+        fila = conn.execute("SELECT MAX(id) FROM logs WHERE channel = ?", (canal,)).fetchone()
+        return fila[0] or 0
+
+@lru_cache(maxsize=256)
+def _historial_cached(canal: str, limit: int, version: int) -> tuple:
+    with get_conn(LOG_PATH) as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT user_message, bot_response FROM logs 
+            WHERE channel = ? ORDER BY id DESC LIMIT ?
+        ''', (canal, limit))
+        
+        historial = []
+        for row in cursor.fetchall():
+            historial.append(f"Usuario: {row[0]}")
+            historial.append(f"Bot: {row[1]}")
+        return tuple(historial)
+
+@lru_cache(maxsize=256)
+def _last_response_cached(canal: str, version: int) -> Optional[str]:
+    with get_conn(LOG_PATH) as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT bot_response FROM logs 
+            WHERE channel = ? ORDER BY id DESC LIMIT 1
+        ''', (canal,))
+        
+        result = cursor.fetchone()
+        return result[0] if result else None
+
 def get_historial_canal(canal: str, limit: int = 5) -> List[str]:
-    """Obtiene historial de conversación por canal"""
+    """Obtiene historial de conversación por canal (memoizado hasta el próximo log del canal)"""
     try:
-        with sqlite3.connect(LOG_PATH) as conn:
-            cursor = conn.cursor()
-            
-            # Crear tabla de logs si no existe
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    channel TEXT NOT NULL,
-                    user_message TEXT NOT NULL,
-                    bot_response TEXT NOT NULL,
-                    response_time REAL,
-                    search_performed INTEGER DEFAULT 0,
-                    results_count INTEGER DEFAULT 0
-                )
-            ''')
-            
-            cursor.execute('''
-                SELECT user_message, bot_response FROM logs 
-                WHERE channel = ? ORDER BY id DESC LIMIT ?
-            ''', (canal, limit))
-            
-            historial = []
-            for row in cursor.fetchall():
-                historial.append(f"Usuario: {row[0]}")
-                historial.append(f"Bot: {row[1]}")
-                
-            return historial
-            
+        return list(_historial_cached(canal, limit, _channel_version(canal)))
     except Exception as e:
         print(f"❌ Error obteniendo historial: {e}")
         return []
 
 def get_last_bot_response(canal: str) -> Optional[str]:
-    """Obtiene última respuesta del bot para un canal"""
+    """Obtiene última respuesta del bot para un canal (memoizada hasta el próximo log del canal)"""
     try:
-        with sqlite3.connect(LOG_PATH) as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    channel TEXT NOT NULL,
-                    user_message TEXT NOT NULL,
-                    bot_response TEXT NOT NULL,
-                    response_time REAL,
-                    search_performed INTEGER DEFAULT 0,
-                    results_count INTEGER DEFAULT 0
-                )
-            ''')
-            
-            cursor.execute('''
-                SELECT bot_response FROM logs 
-                WHERE channel = ? ORDER BY id DESC LIMIT 1
-            ''', (canal,))
-            
-            result = cursor.fetchone()
-            return result[0] if result else None
-            
+        return _last_response_cached(canal, _channel_version(canal))
     except Exception as e:
         print(f"❌ Error obteniendo última respuesta: {e}")
         return None
 
+# Escritura de logs en segundo plano: el request solo encola la fila
+LOG_BATCH_SIZE = 100
+LOG_BATCH_WAIT = 0.05
+_log_queue = queue.Queue()
+_log_thread = None
+_log_thread_lock = threading.Lock()
+_LOG_STOP = object()
+
+def _drain_logs(primero: tuple) -> tuple:
+    """Junta filas hasta LOG_BATCH_SIZE o LOG_BATCH_WAIT segundos"""
+    batch, stop = [primero], False
+    while len(batch) < LOG_BATCH_SIZE:
+        try:
+            item = _log_queue.get(timeout=LOG_BATCH_WAIT)
+        except queue.Empty:
+            break
+        if item is _LOG_STOP:
+            stop = True
+            break
+        batch.append(item)
+    return batch, stop
+
+def _log_writer():
+    stop = False
+    while not stop:
+        item = _log_queue.get()
+        if item is _LOG_STOP:
+            break
+        batch, stop = _drain_logs(item)
+        log_conversations_bulk(batch)
+
+def log_conversations_bulk(rows: List[tuple]):
+    """Inserta varias filas de log en una sola transacción.
+    Cada fila: (timestamp, channel, user_message, bot_response, response_time,
+    search_performed, results_count)"""
+    if not rows:
+        return
+    try:
+        with get_conn(LOG_PATH, write=True) as conn:
+            conn.executemany(_INSERT_LOG_SQL, rows)
+        print(f"📝 Logs registrados: {len(rows)}")
+    except Exception as e:
+        print(f"❌ Error registrando logs: {e}")
+
+def _ensure_log_writer():
+    """Arranca el hilo escritor (también tras un fork, donde el hilo no sobrevive)"""
+    global _log_thread
+    if _log_thread is not None and _log_thread.is_alive():
+        return
+    with _log_thread_lock:
+        if _log_thread is None or not _log_thread.is_alive():
+            _log_thread = threading.Thread(target=_log_writer, name="log-writer", daemon=True)
+            _log_thread.start()
+
+@atexit.register
+def _flush_logs():
+    """Al salir, vacía la cola pendiente antes de cerrar el proceso"""
+    if _log_thread is not None and _log_thread.is_alive():
+        _log_queue.put(_LOG_STOP)
+        _log_thread.join(timeout=5)
+
 def log_conversation(user_message: str, bot_response: str, channel: str, 
                     response_time: float, search_performed: bool, results_count: int):
-    """Registra conversación en logs"""
+    """Registra conversación en logs (se encola; la escribe el hilo de logs)"""
+    _ensure_log_writer()
+    timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    _log_queue.put((timestamp, channel, user_message, bot_response, response_time,
+                    search_performed, results_count))
+
+def initialize_log_db():
+    """Crea la tabla de logs y su índice por canal (una vez, al importar)"""
     try:
-        with sqlite3.connect(LOG_PATH) as conn:
-            cursor = conn.cursor()
-            
-            # Crear tabla si no existe
-            cursor.execute('''
+        with get_conn(LOG_PATH, write=True) as conn:
+            conn.execute('''
                 CREATE TABLE IF NOT EXISTS logs (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     timestamp TEXT NOT NULL,
@@ -399,19 +818,10 @@ def log_conversation(user_message: str, bot_response: str, channel: str,
                     results_count INTEGER DEFAULT 0
                 )
             ''')
-            
-            cursor.execute('''
-                INSERT INTO logs (timestamp, channel, user_message, bot_response, 
-                                response_time, search_performed, results_count)
-                VALUES (datetime('now'), ?, ?, ?, ?, ?, ?)
-            ''', (channel, user_message, bot_response, response_time, 
-                  search_performed, results_count))
-            
-            conn.commit()
-            print(f"📝 Log registrado - Canal: {channel}, Tiempo: {response_time:.2f}s")
-            
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_channel_id ON logs(channel, id DESC)")
     except Exception as e:
-        print(f"❌ Error registrando log: {e}")
+        print(f"❌ Error inicializando logs: {e}")
 
 # Inicializar bases de datos al importar el módulo
-verificar_y_reparar_bd()
\ No newline at end of file
+verificar_y_reparar_bd()
+initialize_log_db()
\ No newline at end of file
@@ -3,63 +3,64 @@ import re
 from typing import Dict, Any
 from logic.filter_data import BARRIOS, OPERACIONES, TIPOS
 
+# ✅ Listas normalizadas y patrones compilados una sola vez al importar
+BARRIOS_LOWER = [b.lower() for b in BARRIOS]
+TIPOS_LOWER = [t.lower() for t in TIPOS]
+OPERACIONES_LOWER = [o.lower() for o in OPERACIONES]
+
+_BARRIO_PATTERNS = [re.compile(p) for p in (
+    r"en ([a-zA-Záéíóúñ\s]+)",
+    r"barrio ([a-zA-Záéíóúñ\s]+)",
+    r"zona ([a-zA-Záéíóúñ\s]+)",
+    r"de ([a-zA-Záéíóúñ\s]+)$",
+)]
+
+_PRECIO_PATTERNS = [re.compile(p) for p in (
+    r"hasta \$?\s*([0-9\.]+)\s*(usd|dólares|dolares)?",
+    r"máximo \$?\s*([0-9\.]+)\s*(usd|dólares|dolares)?",
+    r"precio.*?\$?\s*([0-9\.]+)\s*(usd|dólares|dolares)?",
+    r"menos de \$?\s*([0-9\.]+)\s*(usd|dólares|dolares)?",
+    r"\$?\s*([0-9\.]+)\s*(usd|dólares|dolares|pesos)",
+)]
+
+def _alternativa(terminos) -> str:
+    # Más largos primero para que un término no tape a otro que lo contiene
+    return "|".join(re.escape(t) for t in sorted(terminos, key=len, reverse=True))
+
+# Barrios, tipos y operaciones en una sola pasada (admite plurales):
+# el grupo que matchea indica la categoría
+_TERMINOS_RE = re.compile(
+    rf"\b(?:(?P<neighborhood>{_alternativa(BARRIOS_LOWER)})"
+    rf"|(?P<tipo>{_alternativa(TIPOS_LOWER)})"
+    rf"|(?P<operacion>{_alternativa(OPERACIONES_LOWER)}))(?:e?s)?\b"
+)
+
+_MIN_PRICE_RE = re.compile(r"desde \$?\s*([0-9\.]+)")
+_ROOMS_RE = re.compile(r"(\d+)\s*amb(?:iente)?")
+_SQM_RE = re.compile(r"(\d+)\s*(?:m2|metros)")
+
 def detect_filters(text_lower: str) -> Dict[str, Any]:
     """Detecta y extrae filtros del texto del usuario usando listas estáticas."""
     filters = {}
     
-    barrios_disponibles = [b.lower() for b in BARRIOS]
-    tipos_disponibles = [t.lower() for t in TIPOS]
-    operaciones_disponibles = [o.lower() for o in OPERACIONES]
-    
-    # Detección de barrio
-    barrio_detectado = None
-    for barrio in barrios_disponibles:
-        if barrio in text_lower:
-            barrio_detectado = barrio
+    # Detección de barrio, tipo y operación (primer término de cada categoría)
+    for match in _TERMINOS_RE.finditer(text_lower):
+        filters.setdefault(match.lastgroup, match.group(match.lastgroup))
+        if len(filters) == 3:
             break
     
-    if not barrio_detectado:
-        barrio_patterns = [
-            r"en ([a-zA-Záéíóúñ\s]+)",
-            r"barrio ([a-zA-Záéíóúñ\s]+)",
-            r"zona ([a-zA-Záéíóúñ\s]+)",
-            r"de ([a-zA-Záéíóúñ\s]+)$",
-        ]
-        
-        for pattern in barrio_patterns:
-            match = re.search(pattern, text_lower)
+    if "neighborhood" not in filters:
+        for pattern in _BARRIO_PATTERNS:
+            match = pattern.search(text_lower)
             if match:
                 potential_barrio = match.group(1).strip().lower()
-                if potential_barrio in barrios_disponibles:
-                    barrio_detectado = potential_barrio
+                if potential_barrio in BARRIOS_LOWER:
+                    filters["neighborhood"] = potential_barrio
                     break
     
-    if barrio_detectado:
-        filters["neighborhood"] = barrio_detectado
-    
-    # Detección de tipo
-    for tipo in tipos_disponibles:
-        if tipo in text_lower:
-            filters["tipo"] = tipo
-            break
-    
-    # Detección de operación
-    for operacion in operaciones_disponibles:
-        if operacion in text_lower:
-            filters["operacion"] = operacion
-            break
-    
     # Detección de precio
-    precio_patterns = [
-        r"hasta \$?\s*([0-9\.]+)\s*(usd|dólares|dolares)?",
-        r"máximo \$?\s*([0-9\.]+)\s*(usd|dólares|dolares)?",
-        r"precio.*?\$?\s*([0-9\.]+)\s*(usd|dólares|dolares)?",
-        r"menos de \$?\s*([0-9\.]+)\s*(usd|dólares|dolares)?",
-        r"\$?\s*([0-9\.]+)\s*(usd|dólares|dolares|pesos)",
-    ]
-    
-    for pattern in precio_patterns:
-        match = re.search(pattern, text_lower)
+    for pattern in _PRECIO_PATTERNS:
+        match = pattern.search(text_lower)
         if match:
             try:
                 precio = int(match.group(1).replace('.', ''))
@@ -69,7 +70,7 @@ def detect_filters(text_lower: str) -> Dict[str, Any]:
                 continue
     
     # Precio mínimo
-    min_price_match = re.search(r"desde \$?\s*([0-9\.]+)", text_lower)
+    min_price_match = _MIN_PRICE_RE.search(text_lower)
     if min_price_match:
         try:
             min_price = int(min_price_match.group(1).replace('.', ''))
@@ -78,12 +79,12 @@ def detect_filters(text_lower: str) -> Dict[str, Any]:
             pass
     
     # Ambientes
-    rooms_match = re.search(r"(\d+)\s*amb", text_lower) or re.search(r"(\d+)\s*ambiente", text_lower)
+    rooms_match = _ROOMS_RE.search(text_lower)
     if rooms_match:
         filters["min_rooms"] = int(rooms_match.group(1))
 
     # Metros cuadrados
-    sqm_match = re.search(r"(\d+)\s*m2", text_lower) or re.search(r"(\d+)\s*metros", text_lower)
+    sqm_match = _SQM_RE.search(text_lower)
     if sqm_match:
         filters["min_sqm"] = int(sqm_match.group(1))
 
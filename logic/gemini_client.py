@@ -1,11 +1,16 @@
 import os
+import asyncio
+import logging
+import threading
+import aiohttp
+import orjson
 import google.generativeai as genai
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
+
+logger = logging.getLogger("dante.gemini")
 
 # ✅ CONFIGURACIÓN GLOBAL
-print("=" * 50)
-print("🔍 INICIALIZANDO GEMINI CLIENT")
-print("=" * 50)
+logger.info("🔍 INICIALIZANDO GEMINI CLIENT")
 
 # Cargar API keys
 API_KEYS = []
@@ -14,78 +19,196 @@ for i in range(1, 4):
     key_value = os.environ.get(key_name)
     if key_value and key_value.strip():
         API_KEYS.append(key_value.strip())
-        print(f"✅ {key_name}: Cargada correctamente")
+        logger.info("✅ %s: Cargada correctamente", key_name)
 
 MODEL = os.environ.get("WORKING_MODEL", "gemini-2.0-flash-001")
 
-print(f"🎯 CONFIGURACIÓN FINAL: Modelo={MODEL}, Claves={len(API_KEYS)}")
-print("=" * 50)
+logger.info("🎯 CONFIGURACIÓN FINAL: Modelo=%s, Claves=%d", MODEL, len(API_KEYS))
+
+# ✅ CLIENTE ASÍNCRONO (REST): la librería solo expone async sobre gRPC y
+# acá se fuerza transporte REST, así que se llama al endpoint directamente
+GEMINI_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{MODEL}:generateContent"
+GEMINI_STREAM_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{MODEL}:streamGenerateContent?alt=sse"
+GENERATION_CONFIG = {"temperature": 0.7, "maxOutputTokens": 1000}
+GEMINI_TIMEOUT = aiohttp.ClientTimeout(total=60)
+GEMINI_MAX_CONNECTIONS = 32
+
+_session: Optional[aiohttp.ClientSession] = None
+
+def _get_session() -> aiohttp.ClientSession:
+    """Sesión HTTP compartida (reutiliza conexiones TLS entre requests)"""
+    global _session
+    if _session is None or _session.closed:
+        # Conexiones keep-alive reutilizadas por todos los requests concurrentes
+        conector = aiohttp.TCPConnector(limit=GEMINI_MAX_CONNECTIONS, keepalive_timeout=60,
+                                        ttl_dns_cache=300)
+        _session = aiohttp.ClientSession(timeout=GEMINI_TIMEOUT, connector=conector)
+    return _session
+
+async def close_gemini_session():
+    """Cierra la sesión HTTP compartida (al apagar la app)"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+def _diagnosticar_error(i: int, e: Exception):
+    """Registra el tipo de error de una clave para diagnóstico"""
+    error_type = type(e).__name__
+    error_msg = str(e)
+    
+    # Detectar tipo de error específico
+    if "429" in error_msg:
+        causa = f"Clave {i+1} agotada (rate limit)"
+    elif "401" in error_msg or "PermissionDenied" in error_type or "API_KEY_INVALID" in error_msg:
+        causa = f"Clave {i+1} no autorizada/inválida"
+    elif "quota" in error_msg.lower():
+        causa = f"Clave {i+1} sin quota"
+    elif "503" in error_msg or "500" in error_msg:
+        causa = "Error del servidor Gemini"
+    elif "network" in error_msg.lower() or "connection" in error_msg.lower():
+        causa = "Error de conexión"
+    else:
+        causa = "Error desconocido"
+    
+    logger.warning("❌ ERROR Clave %d: %s: %s (💡 %s)", i + 1, error_type, error_msg, causa)
+
+def _payload(prompt: str) -> Dict[str, Any]:
+    return {
+        "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+        "generationConfig": GENERATION_CONFIG,
+    }
+
+def _texto_respuesta(data: Dict[str, Any]) -> str:
+    """Texto concatenado del primer candidato de una respuesta REST"""
+    candidatos = data.get("candidates") or []
+    partes = candidatos[0].get("content", {}).get("parts", []) if candidatos else []
+    return "".join(p.get("text", "") for p in partes)
+
+async def _generate_async(key: str, prompt: str) -> str:
+    async with _get_session().post(GEMINI_URL, json=_payload(prompt),
+                                   headers={"x-goog-api-key": key}) as resp:
+        if resp.status != 200:
+            raise Exception(f"HTTP {resp.status}: {await resp.text()}")
+        data = await resp.json()
+    
+    texto = _texto_respuesta(data).strip()
+    if not texto:
+        raise Exception("Respuesta vacía de Gemini")
+    return texto
+
+# Llamadas en curso por prompt: pedidos idénticos simultáneos comparten una sola
+_en_vuelo: Dict[str, asyncio.Task] = {}
+
+async def call_gemini_with_rotation_async(prompt: str) -> str:
+    """Versión asíncrona de call_gemini_with_rotation (no bloquea el event loop).
+    Si ya hay una llamada en curso con el mismo prompt, espera esa en vez de repetirla."""
+    tarea = _en_vuelo.get(prompt)
+    if tarea is None:
+        tarea = asyncio.ensure_future(_rotar_async(prompt))
+        _en_vuelo[prompt] = tarea
+        tarea.add_done_callback(lambda _: _en_vuelo.pop(prompt, None))
+    # shield: si un cliente se desconecta, no cancela la llamada de los demás
+    return await asyncio.shield(tarea)
+
+async def _rotar_async(prompt: str) -> str:
+    if not API_KEYS:
+        logger.warning("⚠️ No hay API keys configuradas, usando modo básico")
+        return get_fallback_response()
+    
+    for i, key in enumerate(API_KEYS):
+        try:
+            answer = await _generate_async(key, prompt)
+            logger.info("✅ Éxito con clave %d", i + 1)
+            return answer
+        except Exception as e:
+            _diagnosticar_error(i, e)
+            continue
+    
+    logger.error("💥 TODAS las claves fallaron - usando modo básico")
+    return get_fallback_response()
+
+async def stream_gemini_with_rotation(prompt: str) -> AsyncIterator[str]:
+    """Genera la respuesta de Gemini por fragmentos (SSE del endpoint REST).
+    Rota de clave solo si falla antes del primer fragmento: después ya no
+    se puede reintentar sin duplicar texto."""
+    if not API_KEYS:
+        logger.warning("⚠️ No hay API keys configuradas, usando modo básico")
+        yield get_fallback_response()
+        return
+    
+    for i, key in enumerate(API_KEYS):
+        emitido = False
+        try:
+            async with _get_session().post(GEMINI_STREAM_URL, json=_payload(prompt),
+                                           headers={"x-goog-api-key": key}) as resp:
+                if resp.status != 200:
+                    raise Exception(f"HTTP {resp.status}: {await resp.text()}")
+                async for linea in resp.content:
+                    if not linea.startswith(b"data:"):
+                        continue
+                    texto = _texto_respuesta(orjson.loads(linea[5:]))
+                    if texto:
+                        emitido = True
+                        yield texto
+            if not emitido:
+                raise Exception("Respuesta vacía de Gemini")
+            logger.info("✅ Éxito con clave %d (streaming)", i + 1)
+            return
+        except Exception as e:
+            _diagnosticar_error(i, e)
+            if emitido:
+                return
+    
+    logger.error("💥 TODAS las claves fallaron - usando modo básico")
+    yield get_fallback_response()
+
+# ✅ MODELOS SÍNCRONOS: uno por clave, creados una sola vez
+_SYNC_GENERATION_CONFIG = genai.types.GenerationConfig(temperature=0.7, max_output_tokens=1000)
+_MODELS: Dict[str, Any] = {}
+_models_lock = threading.Lock()
+
+def _generate_sync(key: str, prompt: str):
+    model = _MODELS.get(key)
+    if model is not None:
+        return model.generate_content(prompt, generation_config=_SYNC_GENERATION_CONFIG)
+    
+    # genai.configure es global y el modelo toma su cliente en la primera llamada:
+    # configurar, crear y llamar bajo lock para que quede atado a esta clave
+    with _models_lock:
+        model = _MODELS.get(key)
+        if model is None:
+            genai.configure(api_key=key, transport='rest')  # Forzar transporte REST
+            model = _MODELS[key] = genai.GenerativeModel(MODEL)
+            return model.generate_content(prompt, generation_config=_SYNC_GENERATION_CONFIG)
+    return model.generate_content(prompt, generation_config=_SYNC_GENERATION_CONFIG)
 
 def call_gemini_with_rotation(prompt: str) -> str:
     """Función para llamar a Gemini API con rotación de claves"""
-    print(f"🎯 INICIANDO ROTACIÓN DE CLAVES")
-    print(f"🔧 Modelo: {MODEL}")
-    print(f"🔑 Claves disponibles: {len(API_KEYS)}")
+    logger.debug("🎯 INICIANDO ROTACIÓN DE CLAVES - Modelo: %s, Claves: %d", MODEL, len(API_KEYS))
     
     if not API_KEYS:
-        print("⚠️ No hay API keys configuradas, usando modo básico")
+        logger.warning("⚠️ No hay API keys configuradas, usando modo básico")
         return get_fallback_response()
     
     for i, key in enumerate(API_KEYS):
         try:
-            print(f"🔄 Probando clave {i+1}/{len(API_KEYS)}...")
-            
-            # ✅ CONFIGURACIÓN EXPLÍCITA
-            genai.configure(
-                api_key=key,
-                transport='rest',  # Forzar transporte REST
-            )
-            
-            model = genai.GenerativeModel(MODEL)
-            
-            # ✅ LLAMADA MÁS SIMPLE PARA DIAGNÓSTICO
-            print(f"   📝 Prompt length: {len(prompt)} caracteres")
-            response = model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    max_output_tokens=1000,
-                )
-            )
-            
-            print(f"   ✅ Respuesta recibida, partes: {len(response.parts) if response.parts else 0}")
+            logger.debug("🔄 Probando clave %d/%d - Prompt: %d caracteres", i + 1, len(API_KEYS), len(prompt))
+            response = _generate_sync(key, prompt)
             
             if not response.parts:
                 raise Exception("Respuesta vacía de Gemini")
             
             answer = response.text.strip()
-            print(f"✅ Éxito con clave {i+1}")
-            print(f"   📄 Respuesta: {answer[:100]}...")
+            logger.info("✅ Éxito con clave %d", i + 1)
+            logger.debug("   📄 Respuesta: %s...", answer[:100])
             return answer
 
         except Exception as e:
-            error_type = type(e).__name__
-            error_msg = str(e)
-            
-            print(f"❌ ERROR Clave {i+1}:")
-            print(f"   🏷️  Tipo: {error_type}")
-            print(f"   📄 Mensaje: {error_msg}")
-            
-            # Detectar tipo de error específico
-            if "429" in error_msg:
-                print(f"   💡 Clave {i+1} agotada (rate limit)")
-            elif "401" in error_msg or "PermissionDenied" in error_type or "API_KEY_INVALID" in error_msg:
-                print(f"   💡 Clave {i+1} no autorizada/inválida")
-            elif "quota" in error_msg.lower():
-                print(f"   💡 Clave {i+1} sin quota")
-            elif "503" in error_msg or "500" in error_msg:
-                print(f"   💡 Error del servidor Gemini")
-            elif "network" in error_msg.lower() or "connection" in error_msg.lower():
-                print(f"   💡 Error de conexión")
-            
+            _diagnosticar_error(i, e)
             continue
     
-    print("💥 TODAS las claves fallaron - usando modo básico")
+    logger.error("💥 TODAS las claves fallaron - usando modo básico")
     return get_fallback_response()
 
 def get_fallback_response():
@@ -114,9 +237,12 @@ def build_prompt(user_text, results=None, filters=None, channel="web", style_hin
         }
         
         # Solo obtener información general para contexto, NO para mostrar
-        tipos = list(set([r.get('tipo', '').title() for r in results if r.get('tipo')]))
-        barrios = list(set([r.get('barrio', '') for r in results if r.get('barrio')]))
-        operaciones = list(set([r.get('operacion', '').title() for r in results if r.get('operacion')]))
+        # (una sola pasada sobre los resultados)
+        tipos, barrios, operaciones = set(), set(), set()
+        for r in results:
+            if r.get('tipo'): tipos.add(r['tipo'].title())
+            if r.get('barrio'): barrios.add(r['barrio'])
+            if r.get('operacion'): operaciones.add(r['operacion'].title())
         
         return (
             f"El usuario busca: '{user_text}'\n\n"
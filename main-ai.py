@@ -3,31 +3,54 @@ Backend para Dante Propiedades - Asistente Inmobiliario con IA
 """
 import os
 import re
-import json
+import asyncio
+import logging
+import logging.handlers
+import queue
+import orjson
 import time
-from functools import lru_cache
+import threading
+from cachetools import TTLCache
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from fastapi.openapi.utils import get_openapi
 from typing import Optional, Dict, Any, List
 from pydantic import BaseModel, Field
 
+# ✅ LOGGING: los handlers escriben desde un hilo aparte (QueueListener),
+# el request solo encola el registro. En producción: LOG_LEVEL=WARNING
+logger = logging.getLogger("dante")
+logger.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+logger.propagate = False
+_log_queue = queue.Queue(-1)
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler())
+_log_listener.start()
+
 # Importar lógica de negocio
 from logic.database import (
     initialize_databases,
     verificar_y_reparar_bd,
     query_properties,
+    get_property_detail,
     get_historial_canal,
     get_last_bot_response,
     log_conversation,
+    DEFAULT_SUMMARY_COLUMNS,
+    PUBLIC_COLUMNS,
     DB_PATH,
     LOG_PATH
 )
 from logic.filters import detect_filters
-from logic.gemini_client import call_gemini_with_rotation, build_prompt
+from logic.gemini_client import (
+    call_gemini_with_rotation_async,
+    stream_gemini_with_rotation,
+    close_gemini_session,
+    build_prompt
+)
 from logic.filter_data import BARRIOS, OPERACIONES, TIPOS
 
 # ✅ INICIALIZACIÓN Y CONFIGURACIÓN
@@ -35,7 +58,10 @@ verificar_y_reparar_bd()
 CACHE_DURATION = 300  # 5 minutos para cache
 
 class Metrics:
+    """Contadores del proceso; los incrementos van bajo lock porque
+    también se llaman desde el threadpool (endpoints sync, to_thread)"""
     def __init__(self):
+        self._lock = threading.Lock()
         self.requests_count = 0
         self.successful_requests = 0
         self.failed_requests = 0
@@ -43,25 +69,33 @@ class Metrics:
         self.search_queries = 0
         self.start_time = time.time()
     
-    def increment_requests(self): self.requests_count += 1
-    def increment_success(self): self.successful_requests += 1
-    def increment_failures(self): self.failed_requests += 1
-    def increment_gemini_calls(self): self.gemini_calls += 1
-    def increment_searches(self): self.search_queries += 1
+    def _increment(self, nombre: str):
+        with self._lock:
+            setattr(self, nombre, getattr(self, nombre) + 1)
+    
+    def increment_requests(self): self._increment('requests_count')
+    def increment_success(self): self._increment('successful_requests')
+    def increment_failures(self): self._increment('failed_requests')
+    def increment_gemini_calls(self): self._increment('gemini_calls')
+    def increment_searches(self): self._increment('search_queries')
     def get_uptime(self): return time.time() - self.start_time
 
 metrics = Metrics()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("🔄 Iniciando ciclo de vida de la aplicación...")
+    logger.info("🔄 Iniciando ciclo de vida de la aplicación...")
     initialize_databases()
+    invalidate_cache()
     yield
-    print("✅ Finalizando ciclo de vida de la aplicación.")
+    await close_gemini_session()
+    logger.info("✅ Finalizando ciclo de vida de la aplicación.")
+    _log_listener.stop()
 
 # ✅ APP PRINCIPAL
 app = FastAPI(
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     title="Dante Propiedades API",
     description="Backend para procesamiento de consultas y filtros de propiedades con IA.",
     version="1.1.0"
@@ -88,26 +122,71 @@ app.add_middleware(
 app.mount("/imgs", StaticFiles(directory="imgs"), name="images")
 
 # ✅ CACHE
-query_cache = {}
+CACHE_MAXSIZE = 1024
+query_cache = TTLCache(maxsize=CACHE_MAXSIZE, ttl=CACHE_DURATION)
+_cache_lock = threading.Lock()  # TTLCache no es thread-safe
 
-def get_cache_key(filters: Dict[str, Any]) -> str:
-    return json.dumps(filters, sort_keys=True)
+def get_cache_key(filters: Dict[str, Any]) -> Optional[tuple]:
+    """Clave hashable de los filtros (None si algún valor no es hashable)"""
+    key = tuple(sorted(filters.items()))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
 
 def cache_query_results(filters: Dict[str, Any], results: List[Dict]):
     cache_key = get_cache_key(filters)
-    query_cache[cache_key] = {'results': results, 'timestamp': time.time()}
+    if cache_key is not None:
+        with _cache_lock:
+            query_cache[cache_key] = results
 
 def get_cached_results(filters: Dict[str, Any]) -> Optional[List[Dict]]:
     cache_key = get_cache_key(filters)
-    cached = query_cache.get(cache_key)
-    if cached and (time.time() - cached['timestamp']) < CACHE_DURATION:
-        return cached['results']
-    return None
+    if cache_key is None:
+        return None
+    with _cache_lock:
+        return query_cache.get(cache_key)
+
+def invalidate_cache():
+    """Vacía el cache de búsquedas (llamar al recargar propiedades)"""
+    with _cache_lock:
+        query_cache.clear()
+
+# ✅ TEXTOS FIJOS DEL PROMPT (las listas no cambian en runtime)
+_CONTEXTO_DINAMICO = (
+    f"Barrios disponibles: {', '.join(BARRIOS)}.\n"
+    f"Tipos de propiedad: {', '.join(TIPOS)}.\n"
+    f"Operaciones disponibles: {', '.join(OPERACIONES)}."
+)
+_WHATSAPP_STYLE = "Respondé de forma breve, directa y cálida como si fuera un mensaje de WhatsApp."
+_WEB_STYLE = "Respondé de forma explicativa, profesional y cálida como si fuera una consulta web."
+
+_WELCOME_RE = re.compile(r"\b(?:hola|hi|hello|buenas|empezar|inicio|ayuda)\b")
+_WELCOME_MSG = """¡Hola! 👋 Soy tu asistente de Dante Propiedades. 
+
+        Te ayudo a encontrar la propiedad ideal. Podés:
+        • Usar los filtros a la izquierda para búsquedas específicas
+        • Contarme directamente qué estás buscando
+        • Preguntarme sobre propiedades que veas
+
+        ¿En qué tipo de propiedad estás interesado hoy?"""
+
+# ✅ LIMPIEZA DE RESPUESTAS: líneas de listado que duplican las tarjetas
+_NUM_LINE_RE = re.compile(r'^[ \t]*\d+[\.\)].*(?:\n|$)', re.M)
+_EMOJI_LINE_RE = re.compile(r'^.*[🏠📍💰📋💬🏢📐].*(?:\n|$)', re.M)
+
+# ✅ ACCESO A SQLITE DESDE HANDLERS ASYNC
+DB_CONCURRENCY = 20
+_db_semaphore = asyncio.Semaphore(DB_CONCURRENCY)
+
+async def run_db(func, *args):
+    """Ejecuta una función bloqueante de la BD en el threadpool, con concurrencia acotada"""
+    async with _db_semaphore:
+        return await asyncio.to_thread(func, *args)
 
-@lru_cache(maxsize=100)
-def query_properties_cached(filters_json: str):
-    filters = json.loads(filters_json) if filters_json else {}
-    return query_properties(filters)
+async def _sin_resultado():
+    return None
 
 # ✅ MODELOS DE DATOS
 class PropertyResponse(BaseModel):
@@ -139,6 +218,17 @@ class PropertyResponse(BaseModel):
     moneda_expensas: Optional[str] = None
     fecha_procesamiento: Optional[str] = None
 
+class PropertySummary(BaseModel):
+    """Fila de listado (DEFAULT_SUMMARY_COLUMNS): sin multimedia ni descripción"""
+    id_temporal: str
+    titulo: str
+    barrio: str
+    precio: float
+    ambientes: int
+    metros_cuadrados: float
+    operacion: str
+    tipo: str
+
 class ChatRequest(BaseModel):
     message: str = Field(..., min_length=1, max_length=1000)
     channel: str = Field(default="web")
@@ -157,141 +247,177 @@ class ChatResponse(BaseModel):
 def root():
     return FileResponse("index.html")
 
-@app.post("/chat", response_model=ChatResponse)
+async def _preparar_chat(request: ChatRequest) -> Dict[str, Any]:
+    """Filtros, búsqueda, historial y prompt comunes a /chat y /chat/stream.
+    `prompt` queda en None cuando corresponde la bienvenida en lugar de Gemini."""
+    user_text = request.message.strip()
+    if not user_text:
+        raise HTTPException(status_code=400, detail="El mensaje no puede estar vacío")
+
+    channel = request.channel.strip()
+    filters_from_frontend = request.filters or {}
+    contexto_anterior = request.contexto_anterior
+
+    text_lower = user_text.lower()
+    filters = filters_from_frontend.copy()
+    detected_filters = detect_filters(text_lower)
+    filters.update(detected_filters)
+
+    # ✅ AGREGAR DIAGNÓSTICO AQUÍ
+    logger.debug("🎯 CONSULTA USUARIO: '%s'", user_text)
+    logger.debug("🔍 FILTROS DETECTADOS: %s | FRONTEND: %s | COMBINADOS: %s",
+                 detected_filters, filters_from_frontend, filters)
+
+    # ✅ EVITAR DOBLE BIENVENIDA - Detectar si es un saludo inicial
+    es_saludo_inicial = not contexto_anterior and bool(_WELCOME_RE.search(text_lower))
+    
+    ctx = {
+        "user_text": user_text,
+        "channel": channel,
+        "results": None,
+        "search_performed": False,
+        "prompt": None,
+    }
+
+    # Saludo sin nada que buscar: responder ya, sin tocar BD ni Gemini
+    if es_saludo_inicial and not filters:
+        logger.debug("🎯 DETECTADO: Saludo inicial - enviando bienvenida mejorada")
+        return ctx
+
+    results = None
+    if filters:
+        ctx["search_performed"] = True
+        metrics.increment_searches()
+        results = get_cached_results(filters)
+
+    # Búsqueda (si no estaba en cache) e historial en paralelo, fuera del event loop
+    buscar = filters and results is None
+    resultados_bd, historial = await asyncio.gather(
+        run_db(query_properties, filters, PUBLIC_COLUMNS) if buscar else _sin_resultado(),
+        # El historial solo hace falta para el prompt de Gemini
+        _sin_resultado() if es_saludo_inicial else run_db(get_historial_canal, channel),
+    )
+    if buscar:
+        results = resultados_bd
+        # None = error de BD: no se cachea, el próximo pedido reintenta
+        if results is not None:
+            cache_query_results(filters, results)
+    if ctx["search_performed"]:
+        logger.info("📊 RESULTADOS OBTENIDOS: %d propiedades", len(results) if results else 0)
+    ctx["results"] = results
+
+    if es_saludo_inicial:
+        logger.debug("🎯 DETECTADO: Saludo inicial - enviando bienvenida mejorada")
+    else:
+        contexto_historial = "\nHistorial reciente:\n" + "\n".join(f"- {m}" for m in historial) if historial else ""
+        style_hint = _WHATSAPP_STYLE if channel == "whatsapp" else _WEB_STYLE
+        ctx["prompt"] = build_prompt(user_text, results, filters, channel, f"{style_hint}\n{_CONTEXTO_DINAMICO}\n{contexto_historial}")
+    return ctx
+
+def _limpiar_respuesta(answer: str, results: Optional[List[Dict]]) -> str:
+    """Quita de la respuesta los listados que duplican las tarjetas de propiedades"""
+    # ✅ NUEVA MODIFICACIÓN: Limpiar respuesta cuando hay resultados
+    if not results:
+        return answer
+    logger.debug("🎯 DETECTADO: Hay resultados - limpiando duplicación en respuesta")
+    
+    # Eliminar listados numerados y líneas con emojis de propiedades
+    answer = _EMOJI_LINE_RE.sub('', _NUM_LINE_RE.sub('', answer)).strip()
+    
+    # Si la respuesta quedó muy corta, usar un mensaje genérico
+    if not answer or len(answer) < 20:
+        answer = f"✅ Encontré {len(results)} propiedades que coinciden con tu búsqueda. Te las muestro abajo:"
+    else:
+        # Asegurar que termine con indicación de ver propiedades
+        if "propiedad" not in answer.lower() and "encontré" not in answer.lower():
+            answer += f"\n\n📊 **Encontré {len(results)} propiedades** - Te las muestro en detalle abajo 👇"
+    return answer
+
+def _cerrar_chat(ctx: Dict[str, Any], answer: str, start_time: float) -> Dict[str, Any]:
+    """Registra la conversación y arma el cuerpo de respuesta"""
+    results = ctx["results"]
+    response_time = time.time() - start_time
+    log_conversation(ctx["user_text"], answer, ctx["channel"], response_time,
+                     ctx["search_performed"], len(results) if results else 0)
+    metrics.increment_success()
+    
+    # ✅ AGREGAR DIAGNÓSTICO DE RESPUESTA AQUÍ
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("📤 ENVIANDO RESPUESTA AL FRONTEND: %s... (%d propiedades, búsqueda: %s)",
+                     answer[:100], len(results) if results else 0, ctx['search_performed'])
+        for i, prop in enumerate((results or [])[:2]):
+            logger.debug("   🏠 Prop %d: %s - %s", i + 1, prop['titulo'], prop['operacion'])
+    
+    # Las filas ya vienen validadas de la BD: se serializan directo con orjson
+    return {
+        "response": answer,
+        "results_count": len(results) if results is not None else None,
+        "search_performed": ctx["search_performed"],
+        "propiedades": results
+    }
+
+@app.post("/chat", responses={200: {"model": ChatResponse}})
 async def chat(request: ChatRequest):
     start_time = time.time()
     metrics.increment_requests()
     
     try:
-        user_text = request.message.strip()
-        if not user_text:
-            raise HTTPException(status_code=400, detail="El mensaje no puede estar vacío")
-
-        channel = request.channel.strip()
-        filters_from_frontend = request.filters or {}
-        contexto_anterior = request.contexto_anterior
-        es_seguimiento = request.es_seguimiento
-
-        text_lower = user_text.lower()
-        filters = filters_from_frontend.copy()
-        detected_filters = detect_filters(text_lower)
-        filters.update(detected_filters)
-
-        # ✅ AGREGAR DIAGNÓSTICO AQUÍ
-        print(f"🎯 CONSULTA USUARIO: '{user_text}'")
-        print(f"🔍 FILTROS DETECTADOS: {detected_filters}")
-        print(f"🔍 FILTROS FRONTEND: {filters_from_frontend}")
-        print(f"🔍 FILTROS COMBINADOS: {filters}")
-
-        results = None
-        search_performed = False
-        
-        if filters:
-            search_performed = True
-            metrics.increment_searches()
-            results = query_properties(filters)
-            print(f"📊 RESULTADOS OBTENIDOS: {len(results) if results else 0} propiedades")
-
-        historial = get_historial_canal(channel)
-        contexto_historial = "\nHistorial reciente:\n" + "\n".join(f"- {m}" for m in historial) if historial else ""
-        
-        contexto_dinamico = (
-            f"Barrios disponibles: {', '.join(BARRIOS)}.\n"
-            f"Tipos de propiedad: {', '.join(TIPOS)}.\n"
-            f"Operaciones disponibles: {', '.join(OPERACIONES)}."
-        )
-
-        style_hint = "Respondé de forma breve, directa y cálida como si fuera un mensaje de WhatsApp." if channel == "whatsapp" else "Respondé de forma explicativa, profesional y cálida como si fuera una consulta web."
+        ctx = await _preparar_chat(request)
         
-        # ✅ EVITAR DOBLE BIENVENIDA - Detectar si es un saludo inicial
-        palabras_bienvenida = ['hola', 'hi', 'hello', 'buenas', 'empezar', 'inicio', 'ayuda']
-        es_saludo_inicial = any(palabra in text_lower for palabra in palabras_bienvenida) and not contexto_anterior
-
-        if es_saludo_inicial:
-            print("🎯 DETECTADO: Saludo inicial - enviando bienvenida mejorada")
-            answer = """¡Hola! 👋 Soy tu asistente de Dante Propiedades. 
-
-        Te ayudo a encontrar la propiedad ideal. Podés:
-        • Usar los filtros a la izquierda para búsquedas específicas
-        • Contarme directamente qué estás buscando
-        • Preguntarme sobre propiedades que veas
-
-        ¿En qué tipo de propiedad estás interesado hoy?"""
+        if ctx["prompt"] is None:
+            answer = _WELCOME_MSG
         else:
             # Procesamiento normal con IA
-            prompt = build_prompt(user_text, results, filters, channel, f"{style_hint}\n{contexto_dinamico}\n{contexto_historial}")
             metrics.increment_gemini_calls()
-            answer = call_gemini_with_rotation(prompt)
-            
-            # ✅ NUEVA MODIFICACIÓN: Limpiar respuesta cuando hay resultados
-            if results and len(results) > 0:
-                print("🎯 DETECTADO: Hay resultados - limpiando duplicación en respuesta")
-                
-                # Eliminar listados numerados de propiedades del texto
-                lines = answer.split('\n')
-                clean_lines = []
-                skip_next_lines = False
-                
-                for i, line in enumerate(lines):
-                    line_stripped = line.strip()
-                    
-                    # Detectar inicio de listado (líneas que empiezan con número)
-                    if (line_stripped and 
-                        (line_stripped[0].isdigit() and 
-                         ('.' in line_stripped or ')' in line_stripped or '🏠' in line_stripped or '📍' in line_stripped))):
-                        skip_next_lines = True
-                        continue
-                    
-                    # Detectar líneas con emojis de propiedades que deben omitirse
-                    if any(emoji in line for emoji in ['🏠', '📍', '💰', '📋', '💬']):
-                        continue
-                        
-                    # Si estamos en modo salto, buscar dónde termina el listado
-                    if skip_next_lines:
-                        if line_stripped == "" or i == len(lines) - 1:
-                            skip_next_lines = False
-                        continue
-                    
-                    clean_lines.append(line)
-                
-                # Reconstruir la respuesta
-                answer = '\n'.join(clean_lines).strip()
-                
-                # Si la respuesta quedó muy corta, usar un mensaje genérico
-                if not answer or len(answer) < 20:
-                    answer = f"✅ Encontré {len(results)} propiedades que coinciden con tu búsqueda. Te las muestro abajo:"
-                else:
-                    # Asegurar que termine con indicación de ver propiedades
-                    if "propiedad" not in answer.lower() and "encontré" not in answer.lower():
-                        answer += f"\n\n📊 **Encontré {len(results)} propiedades** - Te las muestro en detalle abajo 👇"
+            answer = await call_gemini_with_rotation_async(ctx["prompt"])
+            answer = _limpiar_respuesta(answer, ctx["results"])
         
-        response_time = time.time() - start_time
-        log_conversation(user_text, answer, channel, response_time, search_performed, len(results) if results else 0)
-        metrics.increment_success()
-        
-        # ✅ AGREGAR DIAGNÓSTICO DE RESPUESTA AQUÍ
-        response_data = ChatResponse(
-            response=answer,
-            results_count=len(results) if results is not None else None,
-            search_performed=search_performed,
-            propiedades=results
-        )
-        
-        print(f"📤 ENVIANDO RESPUESTA AL FRONTEND:")
-        print(f"   📝 Respuesta: {answer[:100]}...")
-        print(f"   📊 Resultados: {len(results) if results else 0} propiedades")
-        print(f"   🔍 Búsqueda realizada: {search_performed}")
-        if results:
-            for i, prop in enumerate(results[:2]):
-                print(f"   🏠 Prop {i+1}: {prop['titulo']} - {prop['operacion']}")
-        
-        return response_data
+        return ORJSONResponse(_cerrar_chat(ctx, answer, start_time))
     
     except Exception as e:
         metrics.increment_failures()
-        print(f"❌ ERROR en endpoint /chat: {type(e).__name__}: {e}")
+        logger.error("❌ ERROR en endpoint /chat: %s: %s", type(e).__name__, e)
         raise HTTPException(status_code=500, detail="Ocurrió un error procesando tu consulta.")
 
+def _sse(evento: Dict[str, Any]) -> bytes:
+    return b"data: " + orjson.dumps(evento) + b"\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Igual que /chat pero emite la respuesta de Gemini por fragmentos (SSE).
+    Cada evento trae {"delta": ...}; el último trae {"done": true} con la
+    respuesta final limpia y las propiedades, igual que el cuerpo de /chat."""
+    start_time = time.time()
+    metrics.increment_requests()
+    
+    try:
+        ctx = await _preparar_chat(request)
+    except Exception as e:
+        metrics.increment_failures()
+        logger.error("❌ ERROR en endpoint /chat/stream: %s: %s", type(e).__name__, e)
+        raise HTTPException(status_code=500, detail="Ocurrió un error procesando tu consulta.")
+    
+    async def eventos():
+        try:
+            if ctx["prompt"] is None:
+                answer = _WELCOME_MSG
+                yield _sse({"delta": answer})
+            else:
+                metrics.increment_gemini_calls()
+                fragmentos = []
+                async for fragmento in stream_gemini_with_rotation(ctx["prompt"]):
+                    fragmentos.append(fragmento)
+                    yield _sse({"delta": fragmento})
+                answer = _limpiar_respuesta("".join(fragmentos).strip(), ctx["results"])
+            yield _sse({"done": True, **_cerrar_chat(ctx, answer, start_time)})
+        except Exception as e:
+            metrics.increment_failures()
+            logger.error("❌ ERROR en endpoint /chat/stream: %s: %s", type(e).__name__, e)
+            yield _sse({"done": True, "error": "Ocurrió un error procesando tu consulta."})
+    
+    return StreamingResponse(eventos(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/filters")
 def get_all_filters():
     """Endpoint para obtener filtros estáticos desde filter_data."""
@@ -301,16 +427,64 @@ def get_all_filters():
         "barrios": BARRIOS
     }
 
-@app.get("/properties", response_model=List[PropertyResponse])
+def _filtros_propiedades(neighborhood, min_price, max_price, min_rooms,
+                         operacion, tipo, min_sqm, max_sqm, q) -> Dict[str, Any]:
+    """Filtros de /properties armados explícitamente (solo los informados)"""
+    filters = {}
+    if neighborhood is not None: filters['neighborhood'] = neighborhood
+    if min_price is not None: filters['min_price'] = min_price
+    if max_price is not None: filters['max_price'] = max_price
+    if min_rooms is not None: filters['min_rooms'] = min_rooms
+    if operacion is not None: filters['operacion'] = operacion
+    if tipo is not None: filters['tipo'] = tipo
+    if min_sqm is not None: filters['min_sqm'] = min_sqm
+    if max_sqm is not None: filters['max_sqm'] = max_sqm
+    if q: filters['texto'] = q  # Texto libre (FTS5)
+    return filters
+
+@app.get("/properties", responses={200: {"model": List[PropertySummary]}})
 def get_properties_endpoint(
     neighborhood: Optional[str] = None, min_price: Optional[float] = None, max_price: Optional[float] = None,
     min_rooms: Optional[int] = None, operacion: Optional[str] = None, tipo: Optional[str] = None,
-    min_sqm: Optional[float] = None, max_sqm: Optional[float] = None, limit: int = 20
+    min_sqm: Optional[float] = None, max_sqm: Optional[float] = None, q: Optional[str] = None,
+    limit: int = 20
+):
+    filters = _filtros_propiedades(neighborhood, min_price, max_price, min_rooms,
+                                   operacion, tipo, min_sqm, max_sqm, q)
+    results = query_properties(filters, DEFAULT_SUMMARY_COLUMNS, limit)
+    if results is None:
+        raise HTTPException(status_code=500, detail="Error consultando propiedades")
+    logger.info("📊 RESULTADOS OBTENIDOS: %d propiedades", len(results))
+    # Filas de la BD (confiables): sin revalidar con PropertyResponse
+    return ORJSONResponse(results)
+
+@app.get("/properties/columnar")
+def get_properties_columnar(
+    neighborhood: Optional[str] = None, min_price: Optional[float] = None, max_price: Optional[float] = None,
+    min_rooms: Optional[int] = None, operacion: Optional[str] = None, tipo: Optional[str] = None,
+    min_sqm: Optional[float] = None, max_sqm: Optional[float] = None, q: Optional[str] = None,
+    limit: int = 20
 ):
-    filters = {k: v for k, v in locals().items() if v is not None and k != 'limit'}
-    results = query_properties(filters)
-    print(f"📊 RESULTADOS OBTENIDOS: {len(results) if results else 0} propiedades")
-    return results[:limit]
+    """Mismos filtros que /properties, en formato columnar: {columna: [valores...]}.
+    Cada nombre de campo viaja una sola vez en lugar de una vez por fila."""
+    filters = _filtros_propiedades(neighborhood, min_price, max_price, min_rooms,
+                                   operacion, tipo, min_sqm, max_sqm, q)
+    results = query_properties(filters, DEFAULT_SUMMARY_COLUMNS, limit)
+    if results is None:
+        raise HTTPException(status_code=500, detail="Error consultando propiedades")
+    logger.info("📊 RESULTADOS OBTENIDOS: %d propiedades", len(results))
+    # Todas las filas salen del mismo SELECT: mismas columnas y en el mismo orden
+    columnas = list(results[0]) if results else []
+    valores = zip(*(r.values() for r in results)) if results else ()
+    return ORJSONResponse(dict(zip(columnas, map(list, valores))))
+
+@app.get("/properties/{id_temporal}", responses={200: {"model": PropertyResponse}})
+def get_property_detail_endpoint(id_temporal: str):
+    """Ficha completa de una propiedad (con multimedia); los listados traen el resumen"""
+    propiedad = get_property_detail(id_temporal)
+    if propiedad is None:
+        raise HTTPException(status_code=404, detail="Propiedad no encontrada")
+    return ORJSONResponse(propiedad)
 
 @app.get("/status")
 def status():
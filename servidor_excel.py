@@ -2,92 +2,206 @@
 
 import sys
 import os
-import json
-from flask import Flask, request, jsonify
+import tempfile
+import re
+import csv
+import orjson
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from hmac import compare_digest
+from flask import Flask, request, jsonify, abort, send_file
+from werkzeug.exceptions import HTTPException
+from werkzeug.utils import safe_join
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from flask_compress import Compress
 from openpyxl import Workbook, load_workbook
-from datetime import datetime
+import logging
+
+class _SafePrintHandler(logging.Handler):
+    """Registros de logging por stdout en ASCII, como safe_print"""
+    def emit(self, record):
+        print(self.format(record).encode('ascii', 'ignore').decode('ascii'))
+
+# Logs de logic.gemini_client (jerarquía "dante", que solo main-ai.py configura).
+# Va antes de importarlo: al cargarse ya informa claves y modelo.
+_dante_logger = logging.getLogger("dante")
+_dante_logger.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+_dante_logger.propagate = False
+_dante_logger.addHandler(_SafePrintHandler())
 
 # Importar lógica de la base de datos de la IA
-from logic.database import query_properties, initialize_databases, get_historial_canal, log_conversation
+from logic.database import (query_properties, query_properties_vec, initialize_databases, get_historial_canal, log_conversation,
+                            distinct_barrios, distinct_tipos, count_properties, propiedades_mtime,
+                            load_soa_cache, close_connections, PUBLIC_COLUMNS)
 from logic.filters import detect_filters
 from logic.gemini_client import call_gemini_with_rotation, build_prompt
 import time
 
+class ORJSONProvider(DefaultJSONProvider):
+    """Serialización JSON con orjson para todos los jsonify()"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
-# Add the new Render URL to CORS
-CORS(app, resources={r"/api/*": {"origins": ["null", "http://dantepropiedades.com.ar", "http://www.dantepropiedades.com.ar", "https://dantepropiedades.com.ar", "https://www.dantepropiedades.com.ar", "http://dantepropiedades.com", "https://danterealestate-github-io.onrender.com", "https://danterealestate.github.io", "https://pagina-web-g82d.onrender.com", "https://artar1.github.io"]}})
+app.json = ORJSONProvider(app)
+
+# Compresión HTTP de las respuestas (Brotli si el cliente lo acepta, si no gzip)
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIN_SIZE'] = 500
+Compress(app)
+
+# Orígenes permitidos como un único patrón compilado
+_ORIGIN_RE = re.compile(
+    r"^(null"
+    r"|https?://(www\.)?dantepropiedades\.(com|com\.ar)"
+    r"|https://danterealestate-github-io\.onrender\.com"
+    r"|https://danterealestate\.github\.io"
+    r"|https://pagina-web-g82d\.onrender\.com"
+    r"|https://artar1\.github\.io)$"
+)
+CORS(app, resources={r"/api/*": {"origins": _ORIGIN_RE}})
 
+# Excel histórico: ya no se escribe, solo se incluye en la exportación
 EXCEL_FILE = 'contactos_dante_propiedades.xlsx'
+CONTACTS_CSV = 'contactos.csv'
+CONTACT_HEADERS = ['Fecha/Hora', 'Nombre', 'Firma', 'Teléfono', 'Propiedad']
+EXPORT_SPOOL_BYTES = 1024 * 1024
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '2205')
+
+# Raíz de los estáticos, fijada al importar (sin os.getcwd() por pedido)
+STATIC_ROOT = os.getcwd()
+
+# Datos del servidor (BDs, contactos, código) fuera del alcance de la ruta genérica
+_PRIVATE_PREFIXES = ('api/', 'instance/', '.')
+_PRIVATE_FILES = frozenset(('contactos_dante_propiedades.xlsx', 'contactos.csv', 'propiedades.json'))
+_PRIVATE_EXT = frozenset(('.py', '.pyc', '.db', '.db-wal', '.db-shm', '.csv', '.xlsx', '.jsonl'))
+
+# Extensión -> mimetype para los archivos estáticos
+_MIME = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.ico': 'image/x-icon',
+    '.svg': 'image/svg+xml',
+    '.css': 'text/css',
+    '.js': 'application/javascript',
+    '.html': 'text/html',
+    '.json': 'application/json'
+}
+
+# Pool compartido para solapar las lecturas de SQLite dentro de /api/chat
+_pool = ThreadPoolExecutor(max_workers=8)
+
+# Un único escritor a la vez sobre el CSV de contactos
+_contacts_lock = threading.Lock()
+_CSV_READY = False
 
 def safe_print(message):
     safe_message = message.encode('ascii', 'ignore').decode('ascii')
     print(safe_message)
 
-def init_excel():
-    if not os.path.exists(EXCEL_FILE):
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Contactos"
-        ws['A1'] = 'Fecha/Hora'
-        ws['B1'] = 'Nombre'
-        ws['C1'] = 'Firma'
-        ws['D1'] = 'Teléfono'
-        ws['E1'] = 'Propiedad'
-        ws.column_dimensions['A'].width = 20
-        ws.column_dimensions['B'].width = 25
-        ws.column_dimensions['C'].width = 15
-        ws.column_dimensions['D'].width = 15
-        ws.column_dimensions['E'].width = 15
-        wb.save(EXCEL_FILE)
-        safe_print(f"SUCCESS: Archivo {EXCEL_FILE} creado exitosamente")
+def _preparar_csv():
+    """Crear el CSV con encabezados si falta. Se llama con _contacts_lock tomado."""
+    global _CSV_READY
+    if not os.path.exists(CONTACTS_CSV):
+        with open(CONTACTS_CSV, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(CONTACT_HEADERS)
+        safe_print(f"SUCCESS: Archivo {CONTACTS_CSV} creado exitosamente")
+    _CSV_READY = True
+
+def init_contactos_csv():
+    with _contacts_lock:
+        _preparar_csv()
+
+def append_contacto(fila):
+    """Agregar una fila al CSV de contactos (O(1), sin reescribir el archivo)"""
+    with _contacts_lock:
+        # Solo el primer guardado del proceso consulta el disco
+        if not _CSV_READY:
+            _preparar_csv()
+        with open(CONTACTS_CSV, 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(fila)
+
+def generar_excel_contactos():
+    """Materializar el XLSX bajo demanda: filas históricas del Excel + CSV.
+    Usa un workbook write_only para no mantener todas las celdas en memoria."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Contactos")
+    for col, width in zip('ABCDE', (20, 25, 15, 15, 15)):
+        ws.column_dimensions[col].width = width
+
+    # El Excel histórico (si existe) ya trae la fila de encabezados
+    if os.path.exists(EXCEL_FILE):
+        legado = load_workbook(EXCEL_FILE, read_only=True)
+        for fila in legado.active.iter_rows(values_only=True):
+            ws.append(fila)
+        legado.close()
     else:
-        safe_print(f"INFO: Archivo {EXCEL_FILE} encontrado")
+        ws.append(CONTACT_HEADERS)
+
+    with _contacts_lock:
+        if os.path.exists(CONTACTS_CSV):
+            with open(CONTACTS_CSV, newline='', encoding='utf-8') as f:
+                filas = csv.reader(f)
+                next(filas, None)  # encabezado del CSV
+                for fila in filas:
+                    ws.append(fila)
+
+    # Exportaciones chicas quedan en memoria; las grandes pasan a disco
+    salida = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES)
+    wb.save(salida)
+    salida.seek(0)
+    return salida
+
+def _es_privado(ruta):
+    """Archivos del servidor que nunca se sirven como estáticos"""
+    return (ruta.startswith(_PRIVATE_PREFIXES) or ruta in _PRIVATE_FILES
+            or os.path.splitext(ruta)[1].lower() in _PRIVATE_EXT)
 
 def serve_static_file(filename):
+    # Rutas de API inexistentes: el frontend espera JSON (response.json())
+    if filename.startswith('api/'):
+        return jsonify({"error": f"Archivo {filename} no encontrado"}), 404
+    
+    # Estáticos que no existen: 404 sin cuerpo, los bots/scanners no pagan un jsonify
+    # safe_join normaliza y devuelve None ante intentos de salir de STATIC_ROOT
+    file_path = safe_join(STATIC_ROOT, filename)
+    if file_path is None:
+        return '', 404
+    
+    # El chequeo va sobre la ruta ya normalizada (imgs/../instance/... no pasa)
+    ruta = os.path.relpath(file_path, STATIC_ROOT).replace(os.sep, '/')
+    if _es_privado(ruta):
+        safe_print(f"Archivo {filename} no se sirve como estático - será manejado por endpoint específico")
+        return '', 404
+    
+    if not os.path.isfile(file_path):
+        return '', 404
+    
+    # send_file usa sendfile y responde 304 cuando coinciden
+    # If-None-Match / If-Modified-Since.
+    # El HTML se revalida siempre; el resto puede quedar 1 hora en caché.
+    ext = os.path.splitext(ruta)[1].lower()
     try:
-        if filename.startswith('api/') or filename in ['contactos_dante_propiedades.xlsx', 'propiedades.json']:
-            safe_print(f"Archivo {filename} no se sirve como estático - será manejado por endpoint específico")
-            return jsonify({"error": f"Archivo {filename} no encontrado"}), 404
-        
-        file_path = os.path.join(os.getcwd(), filename)
-        safe_print(f"Buscando archivo: {file_path}")
-        
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'rb') as f:
-                    content = f.read()
-                
-                # Determinar el tipo de contenido
-                if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.ico', '.svg')):
-                    from flask import Response
-                    return Response(content, mimetype=f'image/{filename.split(".")[-1].lower()}')
-                elif filename.lower().endswith('.css'):
-                    from flask import Response
-                    return Response(content, mimetype='text/css')
-                elif filename.lower().endswith('.js'):
-                    from flask import Response
-                    return Response(content, mimetype='application/javascript')
-                elif filename.lower().endswith('.html'):
-                    from flask import Response
-                    return Response(content, mimetype='text/html')
-                elif filename.lower().endswith('.json'):
-                    from flask import Response
-                    return Response(content, mimetype='application/json')
-                else:
-                    from flask import Response
-                    return Response(content, mimetype='application/octet-stream')
-                    
-            except Exception as e:
-                safe_print(f"Error leyendo {filename}: {str(e)}")
-                return jsonify({"error": f"Error al leer archivo {filename}"}), 500
-        else:
-            safe_print(f"Archivo NO encontrado: {file_path}")
-            return jsonify({"error": f"Archivo {filename} no encontrado"}), 404
-            
+        return send_file(
+            file_path,
+            mimetype=_MIME.get(ext),
+            conditional=True,
+            etag=True,
+            max_age=0 if ext == '.html' else 3600
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         safe_print(f"Error sirviendo {filename}: {str(e)}")
-        return jsonify({"error": f"Error al servir {filename}"}), 500
+        abort(500)
 
 @app.route('/')
 def home():
@@ -101,20 +215,15 @@ def guardar_contacto():
         if not data or 'nombre' not in data:
             return jsonify({"error": "Datos incompletos"}), 400
         
-        init_excel()
-        wb = load_workbook(EXCEL_FILE)
-        ws = wb.active
-        next_row = ws.max_row + 1
-        now = datetime.now()
-        fecha_hora = now.strftime("%Y-%m-%d %H:%M:%S")
-        
-        ws[f'A{next_row}'] = fecha_hora
-        ws[f'B{next_row}'] = data.get('nombre', '')
-        ws[f'C{next_row}'] = data.get('email', '')
-        ws[f'D{next_row}'] = data.get('telefono', '')
-        ws[f'E{next_row}'] = data.get('propiedad_interes', '')
+        fecha_hora = time.strftime("%Y-%m-%d %H:%M:%S")
         
-        wb.save(EXCEL_FILE)
+        append_contacto([
+            fecha_hora,
+            data.get('nombre', ''),
+            data.get('email', ''),
+            data.get('telefono', ''),
+            data.get('propiedad_interes', '')
+        ])
         safe_print(f"Contacto guardado: {data.get('nombre')} - {data.get('email')}")
         
         return jsonify({
@@ -126,10 +235,28 @@ def guardar_contacto():
         safe_print(f"Error guardando contacto: {str(e)}")
         return jsonify({"error": f"Error al guardar contacto: {str(e)}"}), 500
 
+@app.route('/api/export-contacts', methods=['GET'])
+def export_contacts():
+    """Descargar los contactos como XLSX generado en el momento (requiere ?token=)"""
+    token = request.args.get('token', '')
+    if not compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        return jsonify({"error": "Acceso no autorizado"}), 403
+    try:
+        salida = generar_excel_contactos()
+        return send_file(
+            salida,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name=EXCEL_FILE
+        )
+    except Exception as e:
+        safe_print(f"Error exportando contactos: {str(e)}")
+        return jsonify({"error": "Error al exportar contactos"}), 500
+
 @app.route('/api/properties', methods=['GET'])
 def get_all_properties():
     try:
-        properties = query_properties({})
+        properties = query_properties({}, columns=PUBLIC_COLUMNS)
         return jsonify({
             "total": len(properties),
             "properties": properties
@@ -138,29 +265,26 @@ def get_all_properties():
         safe_print(f"Error obteniendo propiedades: {str(e)}")
         return jsonify({"error": f"Error al obtener propiedades"}), 500
 
+# Opciones de filtros memoizadas; se recalculan cuando cambia la BD en disco
+_FILTER_CACHE = {'mtime': None, 'val': None}
+
 def get_filter_options():
     try:
-        properties = query_properties({})
-        barrios = []
-        tipos = []
+        mtime = propiedades_mtime()
+        if mtime is not None and mtime == _FILTER_CACHE['mtime']:
+            return _FILTER_CACHE['val']
         
-        for prop in properties:
-            if not isinstance(prop, dict):
-                safe_print(f"ADVERTENCIA: Elemento no es diccionario: {prop}")
-                continue
-            
-            if prop.get('barrio') and prop['barrio'] not in barrios:
-                barrios.append(prop['barrio'])
-            
-            if prop.get('tipo') and prop['tipo'] not in tipos:
-                tipos.append(prop['tipo'])
-        
-        return {
-            "barrios": sorted(barrios),
-            "tipos": sorted(tipos),
-            "total": len(properties)
+        options = {
+            "barrios": distinct_barrios(),
+            "tipos": distinct_tipos(),
+            "total": count_properties()
         }
         
+        if mtime is not None:
+            _FILTER_CACHE['val'] = options
+            _FILTER_CACHE['mtime'] = mtime
+        return options
+        
     except Exception as e:
         safe_print(f"Error en get_filter_options: {str(e)}")
         return {"error": f"Error obteniendo opciones de filtros: {str(e)}"}
@@ -178,38 +302,43 @@ def get_filter_options_endpoint():
         safe_print(f"Error en endpoint filter-options: {str(e)}")
         return jsonify({"error": f"Error en servidor: {str(e)}"}), 500
 
+# Parámetro del frontend -> (clave de filtro de la BD, conversión)
+_SEARCH_FIELDS = (
+    ('operacion', 'ope', None),
+    ('tipo', 'tipo', None),
+    ('barrio', 'loc', None),
+    ('max_price', 'precio_max', float),
+    ('min_rooms', 'ambientes', int),
+    ('texto', 'q', None), # Texto libre (FTS5 sobre título, descripción, etc.)
+)
+
+@lru_cache(maxsize=256)
+def _cached_query(mtime, key):
+    """Búsqueda memoizada por (versión de la BD, filtros). Tupla: se comparte entre pedidos."""
+    return tuple(query_properties_vec(dict(key), PUBLIC_COLUMNS))
+
 @app.route('/api/properties/search', methods=['GET'])
 def search_properties_endpoint():
     try:
-        # Mapeo de los parámetros del frontend a las claves de filtro de la BD
-        filters = {
-            'operacion': request.args.get('ope'),
-            'tipo': request.args.get('tipo'),
-            'barrio': request.args.get('loc')
-        }
-        
-        # Añadir filtros numéricos solo si tienen valor
-        precio_max = request.args.get('precio_max')
-        if precio_max:
-            try:
-                filters['max_price'] = float(precio_max)
-            except ValueError:
-                pass # Ignorar si no es un número válido
-
-        ambientes = request.args.get('ambientes')
-        if ambientes:
-            try:
-                filters['min_rooms'] = int(ambientes)
-            except ValueError:
-                pass # Ignorar si no es un número válido
-
-        # Limpiar filtros nulos
-        active_filters = {k: v for k, v in filters.items() if v is not None}
+        active_filters = {}
+        for destino, origen, cast in _SEARCH_FIELDS:
+            valor = request.args.get(origen)
+            if not valor:
+                continue
+            if cast:
+                try:
+                    valor = cast(valor)
+                except ValueError:
+                    continue # Ignorar si no es un número válido
+            active_filters[destino] = valor
         
         safe_print(f"--- Nueva Búsqueda ---")
         safe_print(f"Filtros activos: {active_filters}")
         
-        results = query_properties(active_filters)
+        metrics.increment_searches()
+        # El mtime en la clave deja obsoletas las entradas cuando cambia la BD
+        key = tuple(sorted(active_filters.items()))
+        results = _cached_query(propiedades_mtime(), key)
         
         safe_print(f"Propiedades encontradas: {len(results)}")
         
@@ -224,7 +353,10 @@ def search_properties_endpoint():
         return jsonify({"error": f"Error en servidor: {str(e)}"}), 500
 
 class Metrics:
+    """Contadores del proceso; los incrementos van bajo lock porque
+    Flask atiende pedidos en varios hilos (threaded)"""
     def __init__(self):
+        self._lock = threading.Lock()
         self.requests_count = 0
         self.successful_requests = 0
         self.failed_requests = 0
@@ -232,28 +364,35 @@ class Metrics:
         self.search_queries = 0
         self.start_time = time.time()
     
-    def increment_requests(self): self.requests_count += 1
-    def increment_success(self): self.successful_requests += 1
-    def increment_failures(self): self.failed_requests += 1
-    def increment_gemini_calls(self): self.gemini_calls += 1
-    def increment_searches(self): self.search_queries += 1
+    def _increment(self, nombre):
+        with self._lock:
+            setattr(self, nombre, getattr(self, nombre) + 1)
+    
+    def increment_requests(self): self._increment('requests_count')
+    def increment_success(self): self._increment('successful_requests')
+    def increment_failures(self): self._increment('failed_requests')
+    def increment_gemini_calls(self): self._increment('gemini_calls')
+    def increment_searches(self): self._increment('search_queries')
     def get_uptime(self): return time.time() - self.start_time
 
 metrics = Metrics()
 
+# Campos fijos de /api/status; por pedido solo se completan los contadores
+_STATUS_TEMPLATE = {"status": "activo"}
+
 @app.route('/api/status')
 def status():
-    return jsonify({
-        "status": "activo",
-        "uptime_seconds": metrics.get_uptime(),
-        "total_requests": metrics.requests_count,
-        "gemini_calls": metrics.gemini_calls,
-        "search_queries": metrics.search_queries
-    })
+    d = _STATUS_TEMPLATE.copy()
+    d["uptime_seconds"] = metrics.get_uptime()
+    d["total_requests"] = metrics.requests_count
+    d["gemini_calls"] = metrics.gemini_calls
+    d["search_queries"] = metrics.search_queries
+    return jsonify(d)
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
     start_time = time.time()
+    metrics.increment_requests()
     try:
         data = request.get_json()
         if not data or not data.get('message'):
@@ -273,73 +412,104 @@ def chat():
         safe_print(f"Usuario: '{user_text}'")
         safe_print(f"Filtros combinados: {filters}")
 
+        # Búsqueda e historial en paralelo: esperamos max(t_db, t_hist), no la suma
+        fut_hist = _pool.submit(get_historial_canal, channel)
+        fut_q = _pool.submit(query_properties_vec, filters, PUBLIC_COLUMNS) if filters else None
+        
         results = None
-        search_performed = False
+        n_results = 0
+        search_performed = fut_q is not None
         
-        if filters:
-            search_performed = True
-            results = query_properties(filters)
-            safe_print(f"Resultados de la búsqueda: {len(results) if results else 0} propiedades")
+        if fut_q:
+            metrics.increment_searches()
+            # None si la búsqueda falló: el chat responde igual, sin propiedades
+            results = fut_q.result()
+            n_results = len(results) if results is not None else 0
+            safe_print(f"Resultados de la búsqueda: {n_results} propiedades")
 
-        historial = get_historial_canal(channel)
+        historial = fut_hist.result()
         
         prompt = build_prompt(user_text, results, filters, channel, historial)
+        metrics.increment_gemini_calls()
         answer = call_gemini_with_rotation(prompt)
         
         response_time = time.time() - start_time
-        log_conversation(user_text, answer, channel, response_time, search_performed, len(results) if results else 0)
+        # Solo encola la fila: el hilo de logs de logic.database la escribe
+        # por lotes (hasta LOG_BATCH_SIZE filas por transacción)
+        log_conversation(user_text, answer, channel, response_time, search_performed, n_results)
+        
+        # include_props=false omite las fichas (solo results_count);
+        # top_n recorta la lista a las N primeras (ya vienen ordenadas por precio).
+        # Por defecto se devuelven todas, como espera el frontend actual.
+        propiedades = results if data.get('include_props', True) else None
+        top_n = data.get('top_n')
+        if propiedades and isinstance(top_n, int) and top_n > 0:
+            propiedades = propiedades[:top_n]
         
         response_data = {
             "response": answer,
-            "results_count": len(results) if results is not None else None,
+            # null si no hubo búsqueda o si falló; 0 solo cuando no hubo coincidencias
+            "results_count": n_results if results is not None else None,
             "search_performed": search_performed,
-            "propiedades": results
+            "propiedades": propiedades
         }
         
+        metrics.increment_success()
         return jsonify(response_data), 200
     
     except Exception as e:
+        metrics.increment_failures()
         safe_print(f"❌ ERROR en endpoint /api/chat: {type(e).__name__}: {e}")
         return jsonify({"error": "Ocurrió un error procesando tu consulta."}), 500
 
+# Listado ordenado de imgs/, se rehace solo cuando cambia el mtime de la carpeta
+_IMG_CACHE = {'mtime': -1, 'list': []}
+
 @app.route('/api/debug-images')
 def debug_images():
     """Endpoint para verificar qué imágenes están disponibles"""
-    import os
     try:
-        if os.path.exists("imgs"):
-            image_files = os.listdir("imgs")
-            return jsonify({
-                "message": "Carpeta imgs encontrada",
-                "path_absoluto": os.path.abspath("imgs"),
-                "total_images": len(image_files),
-                "images": sorted(image_files)[:20]  # Primeras 20 imágenes ordenadas
-            })
-        else:
+        try:
+            st = os.stat("imgs")
+        except FileNotFoundError:
             return jsonify({"error": "Carpeta 'imgs' no encontrada en el servidor"})
+        
+        if st.st_mtime_ns != _IMG_CACHE['mtime']:
+            _IMG_CACHE['list'] = sorted(os.listdir("imgs"))
+            _IMG_CACHE['mtime'] = st.st_mtime_ns
+        
+        image_files = _IMG_CACHE['list']
+        return jsonify({
+            "message": "Carpeta imgs encontrada",
+            "path_absoluto": os.path.abspath("imgs"),
+            "total_images": len(image_files),
+            "images": image_files[:20]  # Primeras 20 imágenes ordenadas
+        })
     except Exception as e:
         return jsonify({"error": f"Error al leer carpeta: {str(e)}"})
 
-
-@app.route('/api/status', methods=['GET'])
-def api_status():
-    """Endpoint para verificar el estado del servidor"""
-    return jsonify({
-        "status": "online",
-        "message": "Servidor funcionando correctamente",
-        "timestamp": datetime.now().isoformat()
-    }), 200
-
 # **RUTA GENÉRICA AL FINAL** - Debe ser la última
 @app.route('/<path:filename>')
 def serve_any_file(filename):
     return serve_static_file(filename)
 
+def create_app():
+    """Preparar BD, CSV de contactos y caché columnar una sola vez.
+    Con preload_app (gunicorn_flask.conf.py) corre en el master antes de forkear,
+    así los workers heredan la caché ya cargada."""
+    initialize_databases() # Asegura que la BD SQLite esté lista
+    init_contactos_csv()
+    load_soa_cache()
+    # Cada worker abre sus propias conexiones después del fork
+    close_connections()
+    return app
+
+# Producción: gunicorn -c gunicorn_flask.conf.py 'servidor_excel:create_app()'
+# app.run queda solo para desarrollo local.
 if __name__ == '__main__':
     safe_print("Iniciando servidor Flask...")
-    initialize_databases() # Asegura que la BD SQLite esté lista
-    init_excel()
+    create_app()
     safe_print("Servidor listo para recibir solicitudes")
     
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=port, debug=False)